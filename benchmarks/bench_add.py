@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark Hosts.add for bulk imports.
+
+Each run starts from a hosts file of N adblock entries and then force adds N
+entries, half of which collide with existing names, so every replacement
+path in add is exercised. The time per entry should stay roughly flat as N
+grows from 1k to 1M.
+
+Usage: python benchmarks/bench_add.py [N ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts, HostsEntry  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+
+def make_entries(count, offset=0):
+    return [HostsEntry(entry_type='ipv4', address='0.0.0.0',
+                       names=['host{0}.example.com'.format(i + offset)])
+            for i in range(count)]
+
+
+def bench(count):
+    hosts = Hosts(path=os.devnull, entries=make_entries(count))
+    new_entries = make_entries(count, offset=count // 2)
+    start = time.time()
+    result = hosts.add(entries=new_entries, force=True)
+    elapsed = time.time() - start
+    assert result['ipv4_count'] == count
+    assert hosts.count() == count + count // 2
+    return elapsed
+
+
+def main(sizes):
+    print('{0:>10} {1:>10} {2:>14}'.format('entries', 'seconds', 'usec/entry'))
+    for count in sizes:
+        elapsed = bench(count)
+        print('{0:>10} {1:>10.3f} {2:>14.2f}'.format(
+            count, elapsed, elapsed / count * 1e6))
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or DEFAULT_SIZES)
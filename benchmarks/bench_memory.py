@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the memory used by Hosts for a large adblock style hosts file, with
+the default layout and with compact=True.
+
+Memory is measured with tracemalloc as the size of the allocations still
+held once the hosts file has been loaded.
+
+Usage: python benchmarks/bench_memory.py [LINES]
+"""
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts  # noqa: E402
+
+DEFAULT_LINES = 1000000
+
+
+def write_hosts_file(path, lines):
+    with open(path, 'w') as hosts_file:
+        for i in range(lines):
+            hosts_file.write('0.0.0.0 ads{0}.example.com\n'.format(i))
+
+
+def measure(path, compact):
+    gc.collect()
+    tracemalloc.start()
+    hosts = Hosts(path=path, compact=compact)
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert hosts.count() > 0
+    return current
+
+
+def main(lines):
+    handle, path = tempfile.mkstemp(prefix='bench_hosts')
+    os.close(handle)
+    try:
+        write_hosts_file(path, lines)
+        default = measure(path, compact=False)
+        compact = measure(path, compact=True)
+    finally:
+        os.remove(path)
+    print('lines: {0}'.format(lines))
+    for label, size in (('default', default), ('compact', compact)):
+        print('{0:8} {1:8.1f} MiB {2:6.1f} bytes/entry'.format(
+            label, size / 1048576.0, size / float(lines)))
+    print('saving: {0:.1f}%'.format(100.0 * (default - compact) / default))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark parsing a large synthetic hosts file.
+
+Compares the single pass parser used by iter_entries with the previous
+approach of classifying each line with HostsEntry.get_entry_type and then
+splitting it again to build the entry. Exits with a non-zero status if the
+speedup is below the required factor.
+
+Usage: python benchmarks/bench_parse.py [LINES] [MIN_SPEEDUP]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import HostsEntry, iter_entries  # noqa: E402
+
+DEFAULT_LINES = 1000000
+DEFAULT_MIN_SPEEDUP = 2.0
+
+
+def write_hosts_file(path, lines):
+    with open(path, 'w') as hosts_file:
+        hosts_file.write('# synthetic blocklist\n\n127.0.0.1\tlocalhost\n'
+                         '::1\tlocalhost6 # loopback\n')
+        for i in range(lines - 4):
+            hosts_file.write('0.0.0.0 ads{0}.example.com\n'.format(i))
+
+
+def legacy_parse(path):
+    entries = []
+    with open(path, 'r') as hosts_file:
+        for hosts_entry in hosts_file:
+            entry_type = HostsEntry.get_entry_type(hosts_entry)
+            if entry_type == "comment":
+                hosts_entry = hosts_entry.replace("\r", "")
+                hosts_entry = hosts_entry.replace("\n", "")
+                entries.append(HostsEntry(entry_type="comment",
+                                          comment=hosts_entry))
+            elif entry_type == "blank":
+                entries.append(HostsEntry(entry_type="blank"))
+            elif entry_type in ("ipv4", "ipv6"):
+                split_entry = hosts_entry.split('#', 1)
+                chunked_entry = split_entry[0].split()
+                comment = None
+                if len(split_entry) == 2:
+                    comment = split_entry[1].strip()
+                entries.append(HostsEntry(
+                    entry_type=entry_type,
+                    address=chunked_entry[0].strip(),
+                    names=[name.strip() for name in chunked_entry[1:]],
+                    comment=comment))
+    return entries
+
+
+def timed(func, path):
+    start = time.time()
+    count = len(func(path))
+    return time.time() - start, count
+
+
+def main(lines, min_speedup):
+    handle, path = tempfile.mkstemp(prefix='bench_hosts')
+    os.close(handle)
+    try:
+        write_hosts_file(path, lines)
+        legacy_time, legacy_count = timed(legacy_parse, path)
+        new_time, new_count = timed(lambda x: list(iter_entries(x)), path)
+    finally:
+        os.remove(path)
+    assert legacy_count == new_count == lines
+    speedup = legacy_time / new_time
+    print('lines: {0}'.format(lines))
+    print('get_entry_type + split: {0:.3f}s'.format(legacy_time))
+    print('iter_entries:           {0:.3f}s'.format(new_time))
+    print('speedup:                {0:.2f}x'.format(speedup))
+    return 0 if speedup >= min_speedup else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES,
+                  float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MIN_SPEEDUP))
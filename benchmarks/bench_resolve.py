@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of Hosts.resolve on a large synthetic set of entries.
+
+Reports the time per lookup, once the lookup table has been built, for
+names that are present and absent, alongside find_all_matching.
+
+Usage: python benchmarks/bench_resolve.py [NAMES] [LOOKUPS]
+"""
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts, HostsEntry  # noqa: E402
+
+DEFAULT_NAMES = 1000000
+DEFAULT_LOOKUPS = 1000000
+
+
+def per_lookup(statement, lookups):
+    timer = timeit.Timer(statement)
+    return min(timer.repeat(repeat=5, number=lookups)) / lookups
+
+
+def main(names, lookups):
+    hosts = Hosts(path=os.devnull, entries=[
+        HostsEntry.create('ipv4', address='0.0.0.0',
+                          names=['ads{0}.example.com'.format(i)])
+        for i in range(names)])
+    start = time.time()
+    hosts.resolve('ads0.example.com')
+    build_time = time.time() - start
+    resolve = hosts.resolve
+    find = hosts.find_all_matching
+    hit = per_lookup(lambda: resolve('ads1234.example.com'), lookups)
+    miss = per_lookup(lambda: resolve('missing.example.com'), lookups)
+    ipv4 = per_lookup(lambda: resolve('ads1234.example.com', 'ipv4'), lookups)
+    found = per_lookup(lambda: find(name='ads1234.example.com'), lookups // 10)
+    print('names: {0}'.format(names))
+    print('build table:            {0:.3f}s'.format(build_time))
+    print('resolve (found):        {0:.0f}ns'.format(hit * 1e9))
+    print('resolve (not found):    {0:.0f}ns'.format(miss * 1e9))
+    print('resolve (ipv4):         {0:.0f}ns'.format(ipv4 * 1e9))
+    print('find_all_matching:      {0:.0f}ns'.format(found * 1e9))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NAMES,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LOOKUPS))
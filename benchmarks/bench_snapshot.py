@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark loading a large synthetic hosts file from a snapshot.
+
+Compares parsing the hosts file with loading the entries from a snapshot
+saved by a previous load with the same cache path.
+
+Usage: python benchmarks/bench_snapshot.py [LINES]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts  # noqa: E402
+
+DEFAULT_LINES = 1000000
+
+
+def write_hosts_file(path, lines):
+    with open(path, 'w') as hosts_file:
+        hosts_file.write('# synthetic blocklist\n\n127.0.0.1\tlocalhost\n'
+                         '::1\tlocalhost6 # loopback\n')
+        for i in range(lines - 4):
+            hosts_file.write('0.0.0.0 ads{0}.example.com\n'.format(i))
+
+
+def timed(func):
+    start = time.time()
+    count = func().count()
+    return time.time() - start, count
+
+
+def main(lines):
+    directory = tempfile.mkdtemp(prefix='bench_hosts')
+    path = os.path.join(directory, 'hosts')
+    cache = os.path.join(directory, 'hosts.snapshot')
+    try:
+        write_hosts_file(path, lines)
+        parse_time, parse_count = timed(lambda: Hosts(path=path))
+        save_time, _ = timed(lambda: Hosts(path=path, cache=cache))
+        load_time, load_count = timed(lambda: Hosts(path=path, cache=cache))
+        size = os.path.getsize(cache)
+    finally:
+        shutil.rmtree(directory)
+    assert parse_count == load_count == lines
+    print('lines: {0}'.format(lines))
+    print('parse:             {0:.3f}s'.format(parse_time))
+    print('parse and save:    {0:.3f}s'.format(save_time))
+    print('load snapshot:     {0:.3f}s'.format(load_time))
+    print('snapshot size:     {0:.1f} MB'.format(size / 1e6))
+    print('speedup:           {0:.2f}x'.format(parse_time / load_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark finding entries by domain in a large synthetic set of entries.
+
+Compares find_by_suffix with iterating Hosts.entries and matching each
+name, and reports the one-off cost of building the suffix index.
+
+Usage: python benchmarks/bench_suffix.py [NAMES] [MATCHES]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts, HostsEntry  # noqa: E402
+
+DEFAULT_NAMES = 1000000
+DEFAULT_MATCHES = 1000
+
+
+def build_hosts(names, matches):
+    entries = [HostsEntry.create('ipv4', address='0.0.0.0',
+                                 names=['ads{0}.example.com'.format(i)])
+               for i in range(names - matches)]
+    entries.extend(HostsEntry.create('ipv4', address='0.0.0.0',
+                                     names=['t{0}.tracker.example'.format(i)])
+                   for i in range(matches))
+    return Hosts(path=os.devnull, entries=entries)
+
+
+def scan(hosts, suffix):
+    return [entry for entry in hosts.entries
+            if any(name.lower().endswith(suffix) for name in entry.names)]
+
+
+def main(names, matches):
+    hosts = build_hosts(names, matches)
+    start = time.time()
+    scanned = scan(hosts, '.tracker.example')
+    scan_time = time.time() - start
+    start = time.time()
+    hosts.find_by_suffix('*.tracker.example')
+    build_time = time.time() - start
+    start = time.time()
+    found = hosts.find_by_suffix('*.tracker.example')
+    find_time = time.time() - start
+    assert len(scanned) == len(found) == matches
+    print('names: {0}, matches: {1}'.format(names, matches))
+    print('scan entries:          {0:.4f}s'.format(scan_time))
+    print('first find_by_suffix:  {0:.4f}s'.format(build_time))
+    print('find_by_suffix:        {0:.4f}s'.format(find_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NAMES,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MATCHES))
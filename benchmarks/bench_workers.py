@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark loading a large synthetic hosts file with worker processes.
+
+Compares parsing the hosts file in a single process with parsing chunks of
+it in a pool of worker processes. The speedup depends on the number of
+cores available.
+
+Usage: python benchmarks/bench_workers.py [LINES] [WORKERS]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts  # noqa: E402
+
+DEFAULT_LINES = 2000000
+
+
+def write_hosts_file(path, lines):
+    with open(path, 'w') as hosts_file:
+        hosts_file.write('# synthetic blocklist\n\n127.0.0.1\tlocalhost\n'
+                         '::1\tlocalhost6 # loopback\n')
+        for i in range(lines - 4):
+            hosts_file.write('0.0.0.0 ads{0}.example.com\n'.format(i))
+
+
+def timed(func):
+    start = time.time()
+    count = func().count()
+    return time.time() - start, count
+
+
+def main(lines, workers):
+    handle, path = tempfile.mkstemp(prefix='bench_hosts')
+    os.close(handle)
+    try:
+        write_hosts_file(path, lines)
+        serial_time, serial_count = timed(lambda: Hosts(path=path))
+        parallel_time, parallel_count = timed(
+            lambda: Hosts(path=path, workers=workers))
+    finally:
+        os.remove(path)
+    assert serial_count == parallel_count == lines
+    print('lines: {0}, cores: {1}, workers: {2}'.format(
+        lines, multiprocessing.cpu_count(), workers))
+    print('single process:   {0:.3f}s'.format(serial_time))
+    print('worker processes: {0:.3f}s'.format(parallel_time))
+    print('speedup:          {0:.2f}x'.format(serial_time / parallel_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES,
+                  int(sys.argv[2]) if len(sys.argv) > 2
+                  else multiprocessing.cpu_count()))
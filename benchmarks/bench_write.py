@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark Hosts.write for a large hosts file.
+
+Compares the previous approach of one formatted write call per entry with
+the single buffered write, plain and atomic.
+
+Usage: python benchmarks/bench_write.py [ENTRIES]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from python_hosts.hosts import Hosts, HostsEntry  # noqa: E402
+
+DEFAULT_ENTRIES = 1000000
+
+
+def legacy_write(hosts, path):
+    with open(path, 'w') as hosts_file:
+        for line in hosts.entries:
+            if line.entry_type == 'comment':
+                hosts_file.write(line.comment + "\n")
+            if line.entry_type == 'blank':
+                hosts_file.write("\n")
+            if line.entry_type in ('ipv4', 'ipv6'):
+                hosts_file.write("{0}\t{1}{2}\n".format(
+                    line.address, ' '.join(line.names),
+                    " # " + line.comment if line.comment else ""))
+
+
+def main(count):
+    entries = [HostsEntry(entry_type='comment', comment='# blocklist')]
+    entries.extend(HostsEntry(entry_type='ipv4', address='0.0.0.0',
+                              names=['ads{0}.example.com'.format(i)])
+                   for i in range(count - 1))
+    hosts = Hosts(path=os.devnull, entries=entries)
+    directory = tempfile.mkdtemp(prefix='bench_hosts')
+    path = os.path.join(directory, 'hosts')
+    try:
+        for label, func in (
+                ('per-entry writes', lambda: legacy_write(hosts, path)),
+                ('buffered write', lambda: hosts.write(path=path)),
+                ('atomic write', lambda: hosts.write(path=path, atomic=True))):
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+            size = os.path.getsize(path)
+            print('{0:18} {1:7.3f}s {2:8.1f} MiB/s {3:10.0f} entries/s'.format(
+                label, elapsed, size / 1048576.0 / elapsed, count / elapsed))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES)
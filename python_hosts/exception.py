@@ -20,6 +20,11 @@ class UnableToWriteHosts(HostsException):
     pass
 
 
+class UnableToLockHosts(HostsException):
+    """ Raised when the lock on a Hosts file cannot be taken. """
+    pass
+
+
 class HostsEntryException(Exception):
     """ Base exception class. All HostsEntry-specific exceptions should
     subclass this class.
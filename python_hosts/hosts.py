@@ -11,16 +11,72 @@ based machine respectively. Each entry being represented as an instance
 of the HostsEntry class.
 """
 
+import errno
+import gc
+import hashlib
+import io
+import json
+import locale
+import marshal
+import os
+import shutil
+import socket
+import stat
 import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from multiprocessing.pool import Pool, ThreadPool
 
 try:
-    from urllib.request import urlopen
+    import mmap
 except ImportError:  # pragma: no cover
-    from urllib2 import urlopen
-from python_hosts.utils import (is_ipv4, is_ipv6, is_readable, valid_hostnames,
-                                dedupe_list)
-from python_hosts.exception import (InvalidIPv6Address, InvalidIPv4Address,
+    mmap = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+try:
+    from sys import intern
+except ImportError:  # pragma: no cover
+    pass  # intern is a builtin in python 2
+
+try:
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+except ImportError:  # pragma: no cover
+    from urllib2 import HTTPError, Request, urlopen
+from python_hosts.utils import (classify_address, is_ipv4, is_ipv6, is_readable,
+                                network_range, valid_hostnames)
+from python_hosts.exception import (HostsException, InvalidIPv6Address,
+                                    InvalidIPv4Address, UnableToLockHosts,
                                     UnableToWriteHosts)
+from python_hosts.watch import HostsWatcher
+
+# The number of lines parsed at a time when reading a hosts file
+PARSE_BATCH_SIZE = 10000
+# The number of bytes read at a time when downloading a hosts file
+URL_CHUNK_SIZE = 1 << 16
+# The default number of concurrent downloads made by Hosts.import_urls
+IMPORT_URL_WORKERS = 8
+PARSE_CHUNKS_PER_WORKER = 4
+SNAPSHOT_MAGIC = b'PYHOSTS\x01'
+RELOAD_CHUNK_SIZE = 1 << 16
+# The number of seconds between attempts to take the lock in Hosts.locked
+LOCK_POLL_INTERVAL = 0.01
+RESOLVE_FAMILIES = {None: 0, 'ipv4': 1, 'ipv6': 2,
+                    socket.AF_INET: 1, socket.AF_INET6: 2}
 
 
 class HostsEntry(object):
@@ -66,6 +122,25 @@ class HostsEntry(object):
         self.comment = comment
         self.names = names
 
+    @classmethod
+    def create(cls, entry_type, address=None, comment=None, names=None):
+        """
+        Create an instance of a Hosts file entry from values that have
+         already been validated, e.g. by the parser, skipping the checks made
+         by the initialiser
+        :param entry_type: ipv4 | ipv6 | comment | blank
+        :param address: The ipv4 or ipv6 address belonging to the instance
+        :param comment: The comment belonging to the instance
+        :param names: The names that resolve to the specified address
+        :return: An instance of HostsEntry
+        """
+        entry = cls.__new__(cls)
+        entry.entry_type = entry_type
+        entry.address = address
+        entry.comment = comment
+        entry.names = names
+        return entry
+
     def is_real_entry(self):
         return self.entry_type in ('ipv4', 'ipv6')
 
@@ -105,10 +180,9 @@ class HostsEntry(object):
             if entry[0] == "#":
                 return 'comment'
             entry_chunks = entry.split()
-            if is_ipv6(entry_chunks[0]):
-                return 'ipv6'
-            if is_ipv4(entry_chunks[0]):
-                return 'ipv4'
+            address = classify_address(entry_chunks[0])
+            if address is not None:
+                return address.entry_type
 
     @staticmethod
     def str_to_hostentry(entry):
@@ -124,13 +198,9 @@ class HostsEntry(object):
             line_parts = split_line[0].strip().split()
         else:
             line_parts = entry.strip().split()
-        if is_ipv4(line_parts[0]) and valid_hostnames(line_parts[1:]):
-            return HostsEntry(entry_type='ipv4',
-                              address=line_parts[0],
-                              names=line_parts[1:],
-                              comment=inline_comment)
-        elif is_ipv6(line_parts[0]) and valid_hostnames(line_parts[1:]):
-            return HostsEntry(entry_type='ipv6',
+        address = classify_address(line_parts[0])
+        if address is not None and valid_hostnames(line_parts[1:]):
+            return HostsEntry(entry_type=address.entry_type,
                               address=line_parts[0],
                               names=line_parts[1:],
                               comment=inline_comment)
@@ -138,18 +208,672 @@ class HostsEntry(object):
             return False
 
 
+@contextmanager
+def _gc_paused():
+    """
+    Pause the cyclic garbage collector within a block that creates many
+     objects, none of which can form reference cycles, as the collector
+     otherwise repeatedly traverses them as they are created
+    :return: A context manager
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def parse_line(line, compact=False):
+    """
+    Classify and parse a line from a hosts file in a single pass
+    :param line: A line from the hosts file
+    :param compact: Intern the address and names, and store the names as a
+     tuple, so that repeated values are shared between entries
+    :return: An instance of HostsEntry, or None if the line is not a comment,
+     blank or valid address line. Raises an exception if the line holds a
+     valid address without any names.
+    """
+    if not line:
+        return None
+    content, separator, comment = line.partition('#')
+    chunks = content.split()
+    if not chunks:
+        if separator:
+            return HostsEntry.create(
+                'comment', comment=line.replace("\r", "").replace("\n", ""))
+        return HostsEntry.create('blank')
+    address = chunks[0]
+    if len(chunks) == 1 and separator and not content[-1].isspace():
+        # the address is followed directly by '#' so is not an address
+        return None
+    classified = classify_address(address)
+    if classified is None:
+        return None
+    if len(chunks) == 1:
+        raise Exception('Address and Name(s) must be specified.')
+    if compact:
+        return HostsEntry.create(classified.entry_type,
+                                 address=intern(address),
+                                 names=tuple(map(intern, chunks[1:])),
+                                 comment=comment.strip() if separator else None)
+    return HostsEntry.create(classified.entry_type, address=address,
+                             names=chunks[1:],
+                             comment=comment.strip() if separator else None)
+
+
+def _iter_lines(hosts_file):
+    """
+    Yield the lines of a hosts file object as text
+    :param hosts_file: A file object opened in text or binary mode
+    :return: A generator of lines
+    """
+    for line in hosts_file:
+        if isinstance(line, bytes) and not isinstance(line, str):
+            line = line.decode('utf-8')
+        yield line
+
+
+def _parse_lines(lines, compact=False):
+    """
+    Parse a batch of lines from a hosts file, with the cyclic garbage
+     collector paused
+    :param lines: A list of lines from the hosts file
+    :param compact: Parse the lines into compact entries
+    :return: A list of HostsEntry instances
+    """
+    with _gc_paused():
+        entries = [parse_line(line, compact) for line in lines]
+    return [entry for entry in entries if entry]
+
+
+if str is bytes:  # pragma: no cover
+    def _native_str(value, encoding):
+        """
+        Convert bytes read from a hosts file to a native string, which on
+         python 2 they already are, as when read from a file in text mode
+        :param value: The bytes to convert
+        :param encoding: The encoding of the hosts file, which is ignored
+        :return: The value
+        """
+        return value
+else:
+    _native_str = bytes.decode
+
+
+def _parse_byte_lines(lines, addresses, encoding, compact=False):
+    """
+    Parse a batch of lines read as bytes, e.g. from a memory mapped hosts
+     file. Only the part of each line holding the fields kept by the entry is
+     decoded, and each distinct address is classified once.
+    :param lines: A list of lines from the hosts file, without line endings
+    :param addresses: A dictionary caching the classification and shared
+     string of each address seen so far
+    :param encoding: The encoding of the hosts file
+    :param compact: Parse the lines into compact entries
+    :return: A list of HostsEntry instances
+    """
+    entries = []
+    append = entries.append
+    create = HostsEntry.create
+    with _gc_paused():
+        for line in lines:
+            content, separator, comment = line.partition(b'#')
+            chunks = _native_str(content, encoding).split()
+            if not chunks:
+                if separator:
+                    append(create('comment', comment=_native_str(
+                        line.replace(b'\r', b''), encoding)))
+                else:
+                    append(create('blank'))
+                continue
+            if len(chunks) == 1 and separator and not content[-1:].isspace():
+                continue
+            try:
+                classified, address = addresses[chunks[0]]
+            except KeyError:
+                address = intern(chunks[0])
+                classified = classify_address(address)
+                addresses[address] = classified, address
+            if classified is None:
+                continue
+            if len(chunks) == 1:
+                raise Exception('Address and Name(s) must be specified.')
+            names = chunks[1:]
+            if compact:
+                names = tuple(map(intern, names))
+            append(create(classified.entry_type, address=address, names=names,
+                          comment=_native_str(comment, encoding).strip()
+                          if separator else None))
+    return entries
+
+
+def _iter_buffer_entries(buffer, encoding, compact=False):
+    """
+    Lazily parse the content of a hosts file held in a bytes-like buffer,
+     such as a memory mapped file. Lines are split on '\\n' and a trailing
+     '\\r' is dropped.
+    :param buffer: A bytes-like object supporting readline, e.g. an mmap
+    :param encoding: The encoding of the hosts file
+    :param compact: Parse the lines into compact entries
+    :return: A generator of HostsEntry instances
+    """
+    addresses = {}
+    lines = (line.rstrip(b'\r\n') for line in iter(buffer.readline, b''))
+    while True:
+        batch = list(islice(lines, PARSE_BATCH_SIZE))
+        if not batch:
+            return
+        for entry in _parse_byte_lines(batch, addresses, encoding, compact):
+            yield entry
+
+
+def iter_entries(hosts_file, compact=False):
+    """
+    Lazily parse a hosts file, yielding an instance of HostsEntry for each
+     comment, blank or address line. Lines that are not one of these, e.g.
+     an invalid address, are skipped. Raises an exception, as Hosts does, if
+     a line holds a valid address without any names.
+    :param hosts_file: A filesystem path, or a file object opened in text or
+     binary mode
+    :param compact: Intern the addresses and names, and store the names of
+     each entry as a tuple
+    :return: A generator of HostsEntry instances
+    """
+    if isinstance(hosts_file, str) or hasattr(hosts_file, '__fspath__'):
+        with open(hosts_file, 'r') as opened_file:
+            for entry in iter_entries(opened_file, compact):
+                yield entry
+        return
+    lines = _iter_lines(hosts_file)
+    while True:
+        batch = list(islice(lines, PARSE_BATCH_SIZE))
+        if not batch:
+            return
+        for entry in _parse_lines(batch, compact):
+            yield entry
+
+
+def _split_lines(data, count):
+    """
+    Split the content of a file into chunks of roughly equal size, each
+     ending at a line boundary
+    :param data: The content of the file as bytes
+    :param count: The number of chunks to aim for
+    :return: A generator of bytes
+    """
+    size = max(1, len(data) // count)
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start + size)
+        end = len(data) if end < 0 else end + 1
+        yield data[start:end]
+        start = end
+
+
+def _text_reader(binary_file, encoding=None):
+    """
+    Read a binary file object as a file opened in text mode would be. On
+     python 3 the content is decoded and line endings are translated. On
+     python 2 the lines are read as native strings, as they are from a file
+     opened in text mode.
+    :param binary_file: A file object opened in binary mode
+    :param encoding: The encoding of the file, or None for the default
+    :return: A file object yielding lines of native strings
+    """
+    if str is bytes:
+        return binary_file
+    return io.TextIOWrapper(binary_file, encoding=encoding)
+
+
+def _read_chunk(chunk, encoding):
+    """
+    Open a chunk of a file as text, as a file opened in text mode would be
+    :param chunk: The content of the chunk as bytes
+    :param encoding: The encoding of the file
+    :return: A file object yielding lines of native strings
+    """
+    return _text_reader(io.BytesIO(chunk), encoding)
+
+
+def _parse_chunk(args):
+    """
+    Parse a chunk of a hosts file in a worker process
+    :param args: A tuple of the chunk as bytes, its encoding and whether to
+     parse it into compact entries
+    :return: A list of (entry_type, address, comment, names) tuples,
+     serialised with marshal
+    """
+    chunk, encoding, compact = args
+    return marshal.dumps([
+        (entry.entry_type, entry.address, entry.comment, entry.names)
+        for entry in iter_entries(_read_chunk(chunk, encoding), compact)])
+
+
+def _parse_import_chunk(args):
+    """
+    Parse a chunk of a file being imported in a worker process
+    :param args: A tuple of the chunk as bytes, its encoding and whether to
+     parse it into compact entries, which is ignored
+    :return: A tuple of a list of (entry_type, address, comment, names)
+     tuples, the skipped count and the invalid count, serialised with marshal
+    """
+    chunk, encoding, _ = args
+    entries, skipped, invalid_count = Hosts._parse_import_lines(
+        _read_chunk(chunk, encoding))
+    return marshal.dumps((
+        [(entry.entry_type, entry.address, entry.comment, entry.names)
+         for entry in entries], skipped, invalid_count))
+
+
+def _map_chunks(function, data, workers, compact=False):
+    """
+    Split the content of a file at line boundaries and parse the chunks in a
+     pool of worker processes. Results are passed back serialised with
+     marshal, which is much faster to load than the pickled equivalent.
+    :param function: The module level function that parses a chunk
+    :param data: The content of the file as bytes
+    :param workers: The number of worker processes
+    :param compact: Parse the chunks into compact entries
+    :return: A list of the results for each chunk, in the order of the file
+    """
+    encoding = locale.getpreferredencoding(False)
+    chunks = [(chunk, encoding, compact) for chunk in
+              _split_lines(data, workers * PARSE_CHUNKS_PER_WORKER)]
+    pool = Pool(workers)
+    try:
+        results = pool.map(function, chunks)
+    finally:
+        pool.terminate()
+        pool.join()
+    with _gc_paused():
+        return [marshal.loads(result) for result in results]
+
+
+def _create_entries(rows, compact=False):
+    """
+    Create instances of HostsEntry from the tuples returned by the worker
+     processes, with the cyclic garbage collector paused
+    :param rows: An iterable of (entry_type, address, comment, names) tuples
+    :param compact: Intern the addresses and names, as the worker processes
+     cannot intern them in this process
+    :return: A list of HostsEntry instances
+    """
+    create = HostsEntry.create
+    with _gc_paused():
+        if not compact:
+            return [create(*row) for row in rows]
+        return [create(entry_type, address and intern(address), comment,
+                       names and tuple(map(intern, names)))
+                for entry_type, address, comment, names in rows]
+
+
+def _packed_address(address):
+    """
+    Return the packed binary form of an address, as used to compare
+     addresses regardless of how they are written
+    :param address: An ipv4 or ipv6 address
+    :return: The packed address, or None if the address is not valid
+    """
+    classified = classify_address(address)
+    if classified is None:
+        return None
+    return classified.packed
+
+
+def _value_set(values, argument):
+    """
+    Collect the names, addresses or comments passed to a removal as a set.
+     A single string is rejected, as it would otherwise be taken as a set of
+     its characters.
+    :param values: An iterable of values, or None
+    :param argument: The name of the argument, for the error message
+    :return: A set of the values
+    """
+    if values is None:
+        return set()
+    if isinstance(values, (bytes, type(u''))):
+        raise ValueError('{0} must be a list of values, not a '
+                         'string.'.format(argument))
+    try:
+        return set(values)
+    except TypeError:
+        raise ValueError('{0} must be a list of values.'.format(argument))
+
+
+def _as_tuple(addresses):
+    """
+    Return the addresses of a name, as mapped by Hosts._mappings, as a tuple
+    :param addresses: An address or a list of addresses
+    :return: A tuple of addresses
+    """
+    if isinstance(addresses, list):
+        return tuple(addresses)
+    return (addresses,)
+
+
+def _suffix_labels(name):
+    """
+    Split a host name into lower case labels, the top level domain first
+    :param name: A host name
+    :return: A list of labels
+    """
+    return name.lower().rstrip('.').split('.')[::-1]
+
+
+def _has_suffix(name, suffix, strict=False):
+    """
+    Test if a host name is equal to or under a domain, ignoring case
+    :param name: A host name
+    :param suffix: A lower case domain without a trailing '.'
+    :param strict: Only match names under the domain
+    :return: True if the name matches. Otherwise, False.
+    """
+    name = name.lower().rstrip('.')
+    return name.endswith('.' + suffix) or (not strict and name == suffix)
+
+
+def _trie_add(trie, name):
+    """
+    Add a host name to a trie keyed on the labels of names, the top level
+     domain first. The name ending at a node is held under None, or a set
+     of names if several differ only in case or a trailing '.'.
+    :param trie: The root node of the trie, a dictionary
+    :param name: A host name
+    :return: None
+    """
+    node = trie
+    for label in _suffix_labels(name):
+        node = node.setdefault(label, {})
+    names = node.get(None)
+    if names is None:
+        node[None] = name
+    elif isinstance(names, set):
+        names.add(name)
+    elif names != name:
+        node[None] = set((names, name))
+
+
+def _trie_remove(trie, name):
+    """
+    Remove a host name from a trie, removing the nodes left empty
+    :param trie: The root node of the trie, a dictionary
+    :param name: A host name
+    :return: None
+    """
+    path = []
+    node = trie
+    for label in _suffix_labels(name):
+        path.append((node, label))
+        node = node.get(label)
+        if node is None:
+            return
+    names = node.get(None)
+    if isinstance(names, set):
+        names.discard(name)
+        if len(names) == 1:
+            node[None] = names.pop()
+    elif names == name:
+        del node[None]
+    for parent, label in reversed(path):
+        if parent[label]:
+            break
+        del parent[label]
+
+
+def _trie_names(trie, labels, strict=False):
+    """
+    Collect the host names in a trie that are equal to or under a domain
+    :param trie: The root node of the trie, a dictionary
+    :param labels: The labels of the domain, the top level domain first
+    :param strict: Only collect names under the domain
+    :return: A list of host names
+    """
+    node = trie
+    for label in labels:
+        node = node.get(label)
+        if node is None:
+            return []
+    names = []
+    start = node
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for label, child in node.items():
+            if label is not None:
+                stack.append(child)
+            elif strict and node is start:
+                continue
+            elif isinstance(child, set):
+                names.extend(child)
+            else:
+                names.append(child)
+    return names
+
+
+def _chunk_hashes(data, size):
+    """
+    Hash the whole chunks of data of a fixed size, counting both from its
+     start and from its end, so that a common prefix and a common suffix of
+     two versions of a file can be found without keeping either
+    :param data: The content of a file as bytes
+    :param size: The size of each chunk
+    :return: A tuple of the lists of chunk digests from the start and from
+     the end
+    """
+    count = len(data) // size
+    end = len(data)
+    return ([hashlib.sha1(data[i * size:(i + 1) * size]).digest()
+             for i in range(count)],
+            [hashlib.sha1(data[end - (i + 1) * size:end - i * size]).digest()
+             for i in range(count)])
+
+
+def _common_count(old, new):
+    """
+    Count the leading items two sequences have in common
+    :param old: A sequence
+    :param new: A sequence
+    :return: The number of leading items that are equal
+    """
+    count = 0
+    for old_item, new_item in zip(old, new):
+        if old_item != new_item:
+            break
+        count += 1
+    return count
+
+
+def _count_lines(data, start=0, end=None):
+    """
+    Count the lines in a region of the content of a file, including a final
+     line without a line ending
+    :param data: The content of a file as bytes
+    :param start: The offset of the start of the region, at a line start
+    :param end: The offset of the end of the region
+    :return: The number of lines
+    """
+    if end is None:
+        end = len(data)
+    count = data.count(b'\n', start, end)
+    if end > start and data[end - 1:end] != b'\n':
+        count += 1
+    return count
+
+
+class _HashingReader(io.RawIOBase):
+    """ A binary file reader that adds everything read to a hash. """
+
+    def __init__(self, raw_file, content_hash):
+        """
+        Initialise the reader
+        :param raw_file: A file object opened in binary mode
+        :param content_hash: A hashlib hash object
+        :return: None
+        """
+        self.raw_file = raw_file
+        self.content_hash = content_hash
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw_file.readinto(buffer)
+        if count:
+            self.content_hash.update(memoryview(buffer)[:count])
+        return count
+
+
+def _try_lock(lock_file, blocking=False):
+    """
+    Take an exclusive lock on an open file, with flock where available and
+     otherwise by locking its first byte on windows
+    :param lock_file: The open file to lock
+    :param blocking: Wait for the lock with flock
+    :return: True if the lock was taken, otherwise False
+    """
+    if fcntl is not None:
+        operation = fcntl.LOCK_EX
+        if not blocking:
+            operation |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file.fileno(), operation)
+        except (IOError, OSError) as exc:
+            if exc.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+        return True
+    lock_file.seek(0)
+    try:
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def _unlock(lock_file):
+    """
+    Release a lock taken with _try_lock
+    :param lock_file: The locked file
+    :return: None
+    """
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _copy_index(index):
+    """
+    Copy a lookup index, including the lists of entries held under keys
+     with several entries
+    :param index: A dictionary used as a lookup index
+    :return: A dictionary
+    """
+    copied = index.copy()
+    for key, bucket in index.items():
+        if isinstance(bucket, list):
+            copied[key] = list(bucket)
+    return copied
+
+
+def _hash_file(path):
+    """
+    Hash the content of a file
+    :param path: The filesystem path of the file
+    :return: A hashlib sha256 hash object
+    """
+    content_hash = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(1 << 16), b''):
+            content_hash.update(chunk)
+    return content_hash
+
+
+def _index_add(index, key, entry):
+    """
+    Add a HostsEntry to an index under the supplied key. A key held by a
+     single entry, as most names are, maps directly to that entry rather than
+     to a list, which saves a list per key on large hosts files.
+    :param index: A dictionary used as a lookup index
+    :param key: The key to add the entry under
+    :param entry: An instance of HostsEntry
+    :return: None
+    """
+    bucket = index.get(key)
+    if bucket is None:
+        index[key] = entry
+    elif isinstance(bucket, list):
+        if bucket[-1] is not entry:
+            bucket.append(entry)
+    elif bucket is not entry:
+        index[key] = [bucket, entry]
+
+
+def _index_get(index, key):
+    """
+    Return the entries held in an index under the supplied key
+    :param index: A dictionary used as a lookup index
+    :param key: The key to look up
+    :return: A list or tuple of HostsEntry instances
+    """
+    bucket = index.get(key)
+    if bucket is None:
+        return ()
+    if isinstance(bucket, list):
+        return bucket
+    return (bucket,)
+
+
 class Hosts(object):
     """ A hosts file. """
-    __slots__ = ['path','entries']
+    __slots__ = ['path', 'entries', 'streaming', 'compact', 'mmap', 'cache',
+                 'workers', 'lock_wait', '_address_index', '_suffix_trie',
+                 '_resolve_table', '_packed_index', '_packed_keys',
+                 '_reload_state', '_name_index', '_comment_index',
+                 '_indexed_entries', '_indexed_count', '_content_hash',
+                 '_synced_count']
 
-    def __init__(self, path=None, entries=None):
+    def __init__(self, path=None, entries=None, streaming=False,
+                 compact=False, mmap=False, cache=None, workers=None):
         """
         Initialise an instance of a hosts file
         :param path: The filesystem path of the hosts file to manage
+        :param entries: A list of instances of HostsEntry to use instead of
+         reading the hosts file
+        :param streaming: Do not load the entries. Queries are answered by
+         reading the hosts file on each call and the instance is read-only.
+        :param compact: Reduce the memory used by the entries read from the
+         hosts file: addresses and names are interned so that repeated values
+         are stored once, and the names of each entry are stored as a tuple
+        :param mmap: Memory map the hosts file and parse it as bytes, which
+         is faster for very large files. Falls back to reading the file as
+         text if it cannot be mapped.
+        :param cache: The path of a snapshot of the parsed entries. If the
+         snapshot was saved from the current content of the hosts file, the
+         entries are loaded from it instead of parsing the hosts file.
+         Otherwise the hosts file is parsed and the snapshot is saved.
+         Ignored in streaming mode.
+        :param workers: The number of processes to parse the hosts file, and
+         files imported with import_file, with. Each file is read into memory
+         and split into chunks at line boundaries, which are parsed in a pool
+         of worker processes. Only worthwhile for very large files.
         :return: None
         """
 
         self.entries = []
+        self.streaming = streaming
+        self.compact = compact
+        self.mmap = mmap
+        self.cache = cache
+        self.workers = workers
+        self.lock_wait = None
+        self._content_hash = None
+        self._synced_count = None
+        self._reload_state = None
+        self._reset_indexes()
         if path:
             self.path = path
         else:
@@ -157,9 +881,56 @@ class Hosts(object):
 
         if entries:
             self.entries = entries
-        else:
+            self._rebuild_indexes()
+        elif not streaming:
             self.populate_entries()
 
+    @classmethod
+    @contextmanager
+    def locked(cls, path=None, timeout=None, **kwargs):
+        """
+        Read the hosts file while holding an exclusive lock that is released
+         when the block completes, so that processes making changes with
+         locked do not overwrite each other's changes. The lock is taken on
+         a file alongside the hosts file, named after it with a .lock suffix,
+         as the hosts file itself is replaced by atomic writes.
+         e.g. with Hosts.locked() as hosts:
+                  hosts.add(entries)
+                  hosts.write()
+        :param path: The filesystem path of the hosts file to manage
+        :param timeout: The maximum number of seconds to wait for the lock.
+         Waits indefinitely if None.
+        :param kwargs: Other arguments to initialise the instance of Hosts with
+        :return: A context manager yielding an instance of Hosts, with the
+         number of seconds spent waiting for the lock as its lock_wait
+        """
+        if fcntl is None and msvcrt is None:  # pragma: no cover
+            raise UnableToLockHosts('File locking is not supported.')
+        if not path:
+            path = cls.determine_hosts_path()
+        lock_path = os.path.realpath(path) + '.lock'
+        clock = getattr(time, 'monotonic', time.time)
+        try:
+            lock_file = open(lock_path, 'a')
+        except (IOError, OSError):
+            raise UnableToLockHosts('Cannot open: {0}.'.format(lock_path))
+        try:
+            start = clock()
+            while not _try_lock(lock_file, blocking=timeout is None):
+                if timeout is not None and clock() - start >= timeout:
+                    raise UnableToLockHosts(
+                        'Timed out waiting for: {0}.'.format(lock_path))
+                time.sleep(LOCK_POLL_INTERVAL)
+            lock_wait = clock() - start
+            try:
+                hosts = cls(path=path, **kwargs)
+                hosts.lock_wait = lock_wait
+                yield hosts
+            finally:
+                _unlock(lock_file)
+        finally:
+            lock_file.close()
+
     def __repr__(self):
         return 'Hosts(path={0!r}, entries={1!r})'.format(
             self.path, self.entries
@@ -171,12 +942,220 @@ class Hosts(object):
             output += str(entry) + "\n"
         return output
 
+    def copy(self):
+        """
+        Create a copy of the Hosts object that can be changed without
+         affecting this one. The entries themselves are shared, as the Hosts
+         methods replace entries rather than modify them, while the list of
+         entries and the lookup indexes are copied. The copy is of the same
+         class, with the attributes of any subclass.
+        :return: An instance of the class of this object
+        """
+        self._ensure_indexes()
+        cls = type(self)
+        clone = cls.__new__(cls)
+        for klass in cls.__mro__:
+            slots = getattr(klass, '__slots__', ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if name not in ('__dict__', '__weakref__') and \
+                        hasattr(self, name):
+                    setattr(clone, name, getattr(self, name))
+        if getattr(self, '__dict__', None):
+            clone.__dict__.update(self.__dict__)
+        clone.entries = list(self.entries)
+        clone._indexed_entries = clone.entries
+        clone._address_index = _copy_index(self._address_index)
+        clone._name_index = _copy_index(self._name_index)
+        clone._comment_index = _copy_index(self._comment_index)
+        # the indexes that are updated in place are rebuilt when next used,
+        # while the resolve table is only ever replaced, so can be shared
+        clone._suffix_trie = None
+        clone._packed_index = None
+        clone._packed_keys = None
+        if self._content_hash is not None:
+            clone._content_hash = self._content_hash.copy()
+        return clone
+
     def count(self):
         """ Get a count of the number of host entries
         :return: The number of host entries
         """
+        if self.streaming:
+            return sum(1 for _ in self._stream_entries())
         return len(self.entries)
 
+    def _stream_entries(self):
+        """
+        Yield the entries of the hosts file without storing them, as used by
+         the queries of a streaming instance
+        :return: A generator of HostsEntry instances
+        """
+        try:
+            for entry in iter_entries(self.path, self.compact):
+                yield entry
+        except IOError:
+            return
+
+    def _check_writable(self):
+        """
+        Raise an exception if the instance is read-only
+        :return: None
+        """
+        if self.streaming:
+            raise HostsException('Hosts instance is in read-only streaming mode.')
+
+    def _reset_indexes(self):
+        """
+        Clear the address, name and comment lookup indexes
+        :return: None
+        """
+        self._address_index = {}
+        self._name_index = {}
+        self._comment_index = {}
+        self._suffix_trie = None
+        self._resolve_table = None
+        self._packed_index = None
+        self._packed_keys = None
+        self._indexed_entries = self.entries
+        self._indexed_count = 0
+
+    def _rebuild_indexes(self):
+        """
+        Rebuild the lookup indexes from the current list of entries
+        :return: None
+        """
+        self._reset_indexes()
+        for entry in self.entries:
+            self._index_entry(entry)
+
+    def reindex(self):
+        """
+        Rebuild the lookups used by the queries. Must be called after
+         changing an entry in place, or replacing an item of the entries
+         list, without going through the Hosts methods, as such changes
+         cannot be detected. Replacing or resizing the list is detected.
+        :return: None
+        """
+        self._rebuild_indexes()
+        self._synced_count = None
+
+    def _ensure_indexes(self):
+        """
+        Rebuild the lookup indexes if the list of entries has been replaced
+         or resized without going through the Hosts methods
+        :return: None
+        """
+        if (self.entries is not self._indexed_entries or
+                len(self.entries) != self._indexed_count):
+            self._rebuild_indexes()
+            self._synced_count = None
+
+    def _index_entry(self, entry):
+        """
+        Add a HostsEntry to the lookup indexes. Each index maps a key to the
+         entries holding it, in the order they appear in Hosts.
+        :param entry: An instance of HostsEntry
+        :return: None
+        """
+        if entry.address:
+            _index_add(self._address_index, entry.address, entry)
+            if self._packed_index is not None:
+                self._index_packed(entry)
+        if entry.names:
+            trie = self._suffix_trie
+            for name in entry.names:
+                if trie is not None and name not in self._name_index:
+                    _trie_add(trie, name)
+                _index_add(self._name_index, name, entry)
+        if entry.comment:
+            _index_add(self._comment_index, entry.comment, entry)
+        self._indexed_count += 1
+        self._resolve_table = None
+
+    def _reindex_entries(self, replaced):
+        """
+        Update the lookup indexes for HostsEntry instances that have been
+         replaced or removed. Each affected bucket is rebuilt once, however
+         many of its entries change, and replacements keep their position.
+         A replacement must have the address and comment of the entry it
+         replaces, but may have fewer names.
+        :param replaced: A dictionary mapping each HostsEntry instance to its
+         replacement, or to None if it has been removed
+        :return: None
+        """
+        self._resolve_table = None
+        name_index = self._name_index
+        packed_index = self._packed_index
+        indexes = [
+            (self._address_index, set(x.address for x in replaced
+                                      if x.address)),
+            (name_index, set(name for x in replaced if x.names
+                             for name in x.names)),
+            (self._comment_index, set(x.comment for x in replaced
+                                      if x.comment))]
+        if packed_index is not None:
+            indexes.append((packed_index, set(
+                _packed_address(x.address) for x in replaced if x.address)))
+        for index, keys in indexes:
+            for key in keys:
+                bucket = []
+                for entry in _index_get(index, key):
+                    replacement = replaced.get(entry, entry)
+                    if replacement is None:
+                        continue
+                    if (replacement is not entry and index is name_index and
+                            key not in replacement.names):
+                        continue
+                    bucket.append(replacement)
+                if len(bucket) > 1:
+                    index[key] = bucket
+                elif bucket:
+                    index[key] = bucket[0]
+                elif key in index:
+                    del index[key]
+                    if index is name_index and self._suffix_trie is not None:
+                        _trie_remove(self._suffix_trie, key)
+                    elif index is packed_index:
+                        sorted_keys = self._packed_keys[len(key)]
+                        del sorted_keys[bisect_left(sorted_keys, key)]
+
+    def _remove_entries(self, removed):
+        """
+        Remove a set of HostsEntry instances from Hosts in a single pass
+        :param removed: A set of HostsEntry instances
+        :return: None
+        """
+        if removed:
+            self._replace_entries(dict.fromkeys(removed))
+
+    def _replace_entries(self, replaced, reindex=True):
+        """
+        Replace or remove HostsEntry instances in Hosts in a single pass
+        :param replaced: A dictionary mapping each HostsEntry instance to its
+         replacement, or to None to remove it
+        :param reindex: Update the lookup indexes. False if they have already
+         been updated with _reindex_entries.
+        :return: None
+        """
+        self._synced_count = None
+        get = replaced.get
+        self.entries = [y for y in (get(x, x) for x in self.entries)
+                        if y is not None]
+        if reindex:
+            self._reindex_entries(replaced)
+        self._indexed_entries = self.entries
+        self._indexed_count = len(self.entries)
+
+    def _append_entry(self, entry):
+        """
+        Append a HostsEntry to Hosts and to the lookup indexes
+        :param entry: An instance of HostsEntry
+        :return: None
+        """
+        self._ensure_indexes()
+        self.entries.append(entry)
+        self._index_entry(entry)
+
     @staticmethod
     def determine_hosts_path(platform=None):
         """
@@ -193,66 +1172,219 @@ class Hosts(object):
         else:
             return '/etc/hosts'
 
-    def write(self, path=None, mode='w'):
+    def write(self, path=None, mode='w', atomic=False, only_if_changed=False):
         """
         Write all of the HostsEntry instances back to the hosts file
         :param path: override the write path
+        :param mode: The mode to open the hosts file with, 'w' or 'a'
+        :param atomic: Write to a temporary file in the same directory and
+         then move it over the hosts file, so that readers never see a
+         partially written file. The permissions of an existing file are kept.
+        :param only_if_changed: If the hosts file is unchanged since it was
+         read or last written, skip the write when no entries have changed
+         and only append the new entries when entries have only been added.
+         Changes must have been made through the Hosts methods to be detected.
         :return: Dictionary containing counts
         """
-        written_count = 0
-        comments_written = 0
-        blanks_written = 0
-        ipv4_entries_written = 0
-        ipv6_entries_written = 0
+        self._check_writable()
+        self._ensure_indexes()
         if path:
             output_file_path = path
         else:
             output_file_path = self.path
+        tracked = (output_file_path == self.path and
+                   self._synced_count is not None)
+        entries = self.entries
+        if (only_if_changed and tracked and mode == 'w' and
+                self._file_unchanged()):
+            if self._synced_count == len(self.entries):
+                return self._write_result(self.entries)
+            entries = self.entries[self._synced_count:]
+            mode = 'a'
+        data = self._encode(self._render(entries))
+        if (mode.startswith('a') and entries is not self.entries and
+                not self._file_ends_with_newline()):
+            data = self._encode("\n") + data
         try:
-            with open(output_file_path, mode) as hosts_file:
-                for written_count, line in enumerate(self.entries):
-                    if line.entry_type == 'comment':
-                        hosts_file.write(line.comment + "\n")
-                        comments_written += 1
-                    if line.entry_type == 'blank':
-                        hosts_file.write("\n")
-                        blanks_written += 1
-                    if line.entry_type == 'ipv4':
-                        hosts_file.write(
-                            "{0}\t{1}{2}\n".format(
-                                line.address,
-                                ' '.join(line.names),
-                                " # " + line.comment if line.comment else ""
-                            )
-                        )
-                        ipv4_entries_written += 1
-                    if line.entry_type == 'ipv6':
-                        hosts_file.write(
-                            "{0}\t{1}{2}\n".format(
-                                line.address,
-                                ' '.join(line.names),
-                                " # " + line.comment if line.comment else ""
-                            )
-                        )
-                        ipv6_entries_written += 1
+            if atomic:
+                self._write_atomic(output_file_path, data, mode)
+            else:
+                with open(output_file_path, mode + 'b') as hosts_file:
+                    hosts_file.write(data)
         except Exception:
             raise UnableToWriteHosts()
-        return {'total_written': written_count + 1,
-                'comments_written': comments_written,
-                'blanks_written': blanks_written,
-                'ipv4_entries_written': ipv4_entries_written,
-                'ipv6_entries_written': ipv6_entries_written}
+        if output_file_path == self.path:
+            if mode.startswith('a'):
+                if entries is not self.entries:
+                    self._content_hash.update(data)
+                    self._synced_count = len(self.entries)
+                else:
+                    self._synced_count = None
+            else:
+                self._content_hash = hashlib.sha256(data)
+                self._synced_count = len(self.entries)
+        return self._write_result(self.entries)
+
+    @staticmethod
+    def _write_result(entries):
+        """
+        Return the counts of the entries held in the written hosts file
+        :param entries: A list of instances of HostsEntry
+        :return: Dictionary containing counts
+        """
+        counts = {'comment': 0, 'blank': 0, 'ipv4': 0, 'ipv6': 0}
+        for entry in entries:
+            if entry.entry_type in counts:
+                counts[entry.entry_type] += 1
+        return {'total_written': len(entries),
+                'comments_written': counts['comment'],
+                'blanks_written': counts['blank'],
+                'ipv4_entries_written': counts['ipv4'],
+                'ipv6_entries_written': counts['ipv6']}
+
+    @staticmethod
+    def _render(entries):
+        """
+        Render HostsEntry instances as the content of a hosts file
+        :param entries: A list of instances of HostsEntry
+        :return: The content of the hosts file
+        """
+        lines = []
+        append = lines.append
+        join_names = ' '.join
+        for entry in entries:
+            entry_type = entry.entry_type
+            if entry_type == 'ipv4' or entry_type == 'ipv6':
+                if entry.comment:
+                    append(entry.address + "\t" + join_names(entry.names) +
+                           " # " + entry.comment)
+                else:
+                    append(entry.address + "\t" + join_names(entry.names))
+            elif entry_type == 'comment':
+                append(entry.comment)
+            elif entry_type == 'blank':
+                append("")
+        if lines:
+            lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _encode(content):
+        """
+        Encode content as a file opened in text mode would write it. On
+         python 2 native strings are written as they are.
+        :param content: The content of a hosts file
+        :return: The encoded content
+        """
+        if os.linesep != "\n":
+            content = content.replace("\n", os.linesep)
+        if isinstance(content, bytes):
+            return content
+        return content.encode(locale.getpreferredencoding(False))
+
+    def _file_unchanged(self):
+        """
+        Test if the hosts file still holds the content it was read with or
+         last written with
+        :return: True if the content is unchanged. Otherwise, False.
+        """
+        try:
+            content_hash = _hash_file(self.path)
+        except IOError:
+            return False
+        return content_hash.digest() == self._content_hash.digest()
+
+    def _file_ends_with_newline(self):
+        """
+        Test if the hosts file is empty or ends with a line separator
+        :return: True if new lines can be appended as they are
+        """
+        try:
+            with open(self.path, 'rb') as hosts_file:
+                hosts_file.seek(0, os.SEEK_END)
+                if not hosts_file.tell():
+                    return True
+                hosts_file.seek(-1, os.SEEK_END)
+                return hosts_file.read(1) in (b"\n", b"\r")
+        except IOError:
+            return True
+
+    @staticmethod
+    def _write_atomic(path, data, mode='w'):
+        """
+        Write data to a temporary file alongside path, flush it to disk
+         and then rename it over path
+        :param path: The filesystem path to write
+        :param data: The encoded content to write
+        :param mode: 'w' to replace the existing content or 'a' to append
+        :return: None
+        """
+        path = os.path.realpath(path)
+        handle, temp_path = tempfile.mkstemp(
+            prefix='.{0}.'.format(os.path.basename(path)),
+            dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                if mode.startswith('a') and os.path.exists(path):
+                    with open(path, 'rb') as existing_file:
+                        shutil.copyfileobj(existing_file, temp_file)
+                temp_file.write(data)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            if os.path.exists(path):
+                path_stat = os.stat(path)
+                os.chmod(temp_path, stat.S_IMODE(path_stat.st_mode))
+                try:
+                    os.chown(temp_path, path_stat.st_uid, path_stat.st_gid)
+                except (AttributeError, OSError):
+                    pass
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(temp_path, 0o666 & ~umask)
+            getattr(os, 'replace', os.rename)(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        try:
+            directory = os.open(os.path.dirname(path), os.O_RDONLY)
+        except (AttributeError, OSError):  # pragma: no cover
+            return
+        try:
+            os.fsync(directory)
+        except OSError:  # pragma: no cover
+            pass
+        finally:
+            os.close(directory)
 
     @staticmethod
     def get_hosts_by_url(url=None):
         """
-        Request the content of a URL and return the response
+        Request the content of a URL and return the response. If overridden,
+         it is used by import_url, import_urls and merge to download hosts
+         files instead of open_url, and the entries are not cached.
         :param url: The URL of the hosts file to download
         :return: The content of the passed URL
         """
         response = urlopen(url)
         return response.read()
 
+    # the default get_hosts_by_url, to find whether it has been overridden
+    _default_get_hosts_by_url = get_hosts_by_url
+
+    @staticmethod
+    def open_url(url):
+        """
+        Open a URL, as used by import_url, import_urls and merge to download
+         hosts files, which are read from the response as it is received.
+         Override to change how hosts files are downloaded.
+        :param url: The URL of the hosts file to download, or a Request for it
+        :return: The response, a file object with the response headers as
+         its headers attribute
+        """
+        return urlopen(url)
+
     def exists(self, address=None, names=None, comment=None):
         """
         Determine if the supplied address and/or names, or comment, exists in
@@ -263,15 +1395,25 @@ class Hosts(object):
         :return: True if a supplied address, name, or comment is found.
             Otherwise, False.
         """
+        if self.streaming:
+            for entry in self._stream_entries():
+                for name in (names or [None]):
+                    if self._matches(entry, address=address, name=name,
+                                     comment=comment):
+                        return True
+                if (comment and entry.entry_type == 'comment' and
+                        entry.comment == comment):
+                    return True
+            return False
+
         for name in (names or [None]):
             if self.find_all_matching(address=address, name=name, comment=comment):
                 return True
 
-        for entry in self.entries:
-            if entry.entry_type == 'comment' and entry.comment == comment:
-                return True
-            # elif entry.entry_type in ('ipv4', 'ipv6'):
-            #     pass # already covered above
+        if comment:
+            for entry in self._candidates(comment=comment):
+                if entry.entry_type == 'comment' and entry.comment == comment:
+                    return True
         return False
 
     def remove_all_matching(self, address=None, name=None, comment=None):
@@ -283,6 +1425,7 @@ class Hosts(object):
         :param comment: A host inline comment
         :return: None
         """
+        self._check_writable()
         if address or name or comment:
             pass
         else:
@@ -293,7 +1436,424 @@ class Hosts(object):
             name=name,
             comment=comment
             )
-        self.entries = list(filter(lambda x: x not in result, self.entries))
+        self._remove_entries(set(result))
+
+    def remove_many(self, names=None, addresses=None, comments=None):
+        """
+        Remove all HostsEntry instances from the Hosts object where any of
+         the supplied names, ip addresses or comments match, in a single pass
+        :param names: An iterable of host names
+        :param addresses: An iterable of ipv4 or ipv6 addresses
+        :param comments: An iterable of host inline comments
+        :return: The counts of entries matching each kind of value, and of
+         the entries removed, which may match several
+        """
+        self._check_writable()
+        if not (names or addresses or comments):
+            raise ValueError('No addresses, names or comments were specified '
+                             'for removal.')
+        names = _value_set(names, 'names')
+        addresses = _value_set(addresses, 'addresses')
+        comments = _value_set(comments, 'comments')
+        self._ensure_indexes()
+        removed = set()
+        result = {}
+        for key, index, values in (
+                ('name_count', self._name_index, names),
+                ('address_count', self._address_index, addresses),
+                ('comment_count', self._comment_index, comments)):
+            matched = set()
+            self._matching_real_entries(index, values, matched)
+            result[key] = len(matched)
+            removed.update(matched)
+        self._remove_entries(removed)
+        result['removed_count'] = len(removed)
+        return result
+
+    def remove_names(self, names=None):
+        """
+        Remove the supplied names from the HostsEntry instances holding them,
+         keeping their other names. Entries left without any names are
+         removed. Edited entries are replaced with new instances of HostsEntry
+         rather than modified, so instances held elsewhere are unaffected.
+        :param names: An iterable of host names
+        :return: The counts of names removed, of entries edited and of
+         entries removed
+        """
+        self._check_writable()
+        names = _value_set(names, 'names')
+        self._ensure_indexes()
+        matched = set()
+        self._matching_real_entries(self._name_index, names, matched)
+        replaced = {}
+        name_count = 0
+        edited_count = 0
+        for entry in matched:
+            kept = [x for x in entry.names if x not in names]
+            name_count += len(entry.names) - len(kept)
+            if kept:
+                edited_count += 1
+                replaced[entry] = HostsEntry.create(
+                    entry.entry_type, address=entry.address,
+                    comment=entry.comment, names=type(entry.names)(kept))
+            else:
+                replaced[entry] = None
+        if replaced:
+            self._replace_entries(replaced)
+        return {'name_count': name_count,
+                'edited_count': edited_count,
+                'removed_count': len(replaced) - edited_count}
+
+    def resolve(self, name, family=None):
+        """
+        Return the address a name resolves to, as a resolver reading the
+         hosts file would: names are matched ignoring case and a trailing '.',
+         and the first matching entry wins. Lookups use a table of each name's
+         first addresses, which is built on first use and after any change.
+        :param name: A host name
+        :param family: None for the first address of either kind, or 'ipv4'
+         or 'ipv6' (or socket.AF_INET or socket.AF_INET6) for the first
+         address of that kind
+        :return: An ipv4 or ipv6 address, or None if the name is not found
+        """
+        position = RESOLVE_FAMILIES.get(family)
+        if position is None:
+            raise ValueError('Unknown address family: {0}.'.format(family))
+        if self.streaming:
+            return self._resolve_from_file(name, position)
+        table = self._resolve_table
+        if (table is None or self.entries is not self._indexed_entries or
+                len(self.entries) != self._indexed_count):
+            table = self._build_resolve_table()
+        addresses = table.get(name.lower().rstrip('.'))
+        if addresses:
+            return addresses[position]
+        return None
+
+    def _build_resolve_table(self):
+        """
+        Build the table used by resolve, mapping each lower case name to a
+         tuple of its first address of either kind, first ipv4 address and
+         first ipv6 address
+        :return: The table, a dictionary
+        """
+        self._ensure_indexes()
+        table = {}
+        for entry in self.entries:
+            if entry.entry_type == 'ipv4':
+                position = 1
+            elif entry.entry_type == 'ipv6':
+                position = 2
+            else:
+                continue
+            address = entry.address
+            for name in entry.names:
+                key = name.lower().rstrip('.')
+                addresses = table.get(key)
+                if addresses is None:
+                    addresses = [address, None, None]
+                elif addresses[position] is None:
+                    addresses = list(addresses)
+                else:
+                    continue
+                addresses[position] = address
+                table[key] = tuple(addresses)
+        self._resolve_table = table
+        return table
+
+    def _resolve_from_file(self, name, position):
+        """
+        Resolve a name by reading the hosts file, as used by a streaming
+         instance
+        :param name: A host name
+        :param position: 0 for either kind of address, 1 for ipv4 or 2 for
+         ipv6
+        :return: An ipv4 or ipv6 address, or None if the name is not found
+        """
+        key = name.lower().rstrip('.')
+        entry_type = (None, 'ipv4', 'ipv6')[position]
+        for entry in self._stream_entries():
+            if (entry.is_real_entry() and
+                    entry_type in (None, entry.entry_type) and
+                    any(x.lower().rstrip('.') == key for x in entry.names)):
+                return entry.address
+        return None
+
+    def names_for(self, address):
+        """
+        Return the names of the entries with the supplied address, comparing
+         addresses by their value so that, e.g., '::1' matches
+         '0:0:0:0:0:0:0:1'
+        :param address: An ipv4 or ipv6 address
+        :return: A list of names, in the order they appear in Hosts
+        """
+        packed = _packed_address(address)
+        if packed is None:
+            return []
+        if self.streaming:
+            entries = (x for x in self._stream_entries()
+                       if x.is_real_entry() and
+                       _packed_address(x.address) == packed)
+        else:
+            self._ensure_packed_index()
+            entries = _index_get(self._packed_index, packed)
+        names = []
+        seen = set()
+        for entry in entries:
+            for name in entry.names:
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        return names
+
+    def find_in_network(self, network):
+        """
+        Return all HostsEntry instances from the Hosts object with an address
+         in the supplied network
+        :param network: A network in CIDR notation, e.g. '10.0.0.0/8'
+        :return: HostsEntry instances, ordered by address
+        """
+        first, last = network_range(network)
+        if self.streaming:
+            matched = [(packed, x) for packed, x in (
+                (_packed_address(x.address), x)
+                for x in self._stream_entries() if x.is_real_entry())
+                if packed and len(packed) == len(first) and
+                first <= packed <= last]
+            matched.sort(key=lambda x: x[0])
+            return [x for _, x in matched]
+        self._ensure_packed_index()
+        keys = self._packed_keys[len(first)]
+        results = []
+        for packed in keys[bisect_left(keys, first):bisect_right(keys, last)]:
+            results.extend(_index_get(self._packed_index, packed))
+        return results
+
+    def _ensure_packed_index(self):
+        """
+        Build the index of entries by packed address, and the sorted lists
+         of its ipv4 and ipv6 keys used for network queries, if it has not
+         been built since the lookup indexes were last reset. Both are built
+         before being stored so that they are never seen partly built.
+        :return: None
+        """
+        self._ensure_indexes()
+        if self._packed_index is not None:
+            return
+        packed_index = {}
+        for entry in self.entries:
+            if entry.address:
+                packed = _packed_address(entry.address)
+                if packed is not None:
+                    _index_add(packed_index, packed, entry)
+        packed_keys = {4: [], 16: []}
+        for packed in packed_index:
+            packed_keys[len(packed)].append(packed)
+        for keys in packed_keys.values():
+            keys.sort()
+        self._packed_keys = packed_keys
+        self._packed_index = packed_index
+
+    def _index_packed(self, entry):
+        """
+        Add a HostsEntry to the index of entries by packed address
+        :param entry: An instance of HostsEntry with an address
+        :return: None
+        """
+        packed = _packed_address(entry.address)
+        if packed is None:
+            return
+        if packed not in self._packed_index:
+            insort(self._packed_keys[len(packed)], packed)
+        _index_add(self._packed_index, packed, entry)
+
+    def diff(self, other):
+        """
+        Compare the names and addresses of this Hosts object with another.
+         Each name is mapped to its addresses, in the order they appear, and
+         each address to its names, with the addresses in their canonical
+         form. The mappings are
+         compared by hashing rather than by searching.
+        :param other: An instance of Hosts, which may be streaming
+        :return: A dictionary of the names that have been added to, and
+         removed from, other as lists of (name, addresses) tuples and the
+         names that have changed address as (name, old addresses, new
+         addresses) tuples, all sorted by name. Under 'addresses', a
+         dictionary of the addresses that have been added and removed as
+         (address, names) tuples and the addresses whose names have changed
+         as (address, names removed, names added) tuples, all sorted by
+         address with the names sorted.
+        """
+        old, old_addresses = self._mappings()
+        new, new_addresses = other._mappings()
+        changed = []
+        for address, names in old_addresses.items():
+            new_names = new_addresses.get(address)
+            if new_names is None or new_names == names:
+                continue
+            names, new_names = set(names), set(new_names)
+            if names != new_names:
+                changed.append((address, tuple(sorted(names - new_names)),
+                                tuple(sorted(new_names - names))))
+        return {
+            'added': sorted((name, _as_tuple(addresses))
+                            for name, addresses in new.items()
+                            if name not in old),
+            'removed': sorted((name, _as_tuple(addresses))
+                              for name, addresses in old.items()
+                              if name not in new),
+            'changed': sorted((name, _as_tuple(addresses),
+                               _as_tuple(new[name]))
+                              for name, addresses in old.items()
+                              if name in new and new[name] != addresses),
+            'addresses': {
+                'added': sorted(
+                    (address, tuple(sorted(set(names))))
+                    for address, names in new_addresses.items()
+                    if address not in old_addresses),
+                'removed': sorted(
+                    (address, tuple(sorted(set(names))))
+                    for address, names in old_addresses.items()
+                    if address not in new_addresses),
+                'changed': sorted(changed)}}
+
+    def unified_diff(self, other, fromfile='a', tofile='b'):
+        """
+        Yield a diff of the names and addresses of this Hosts object and
+         another in a unified style: a line for each address of each name
+         that differs, prefixed with '-' for this Hosts object and '+' for
+         other, in name order, as found by the name mappings of diff
+        :param other: An instance of Hosts, which may be streaming
+        :param fromfile: The label of this Hosts object
+        :param tofile: The label of other
+        :return: A generator of lines, without line endings
+        """
+        result = self.diff(other)
+        del result['addresses']
+        changes = sorted(
+            [(name, addresses, ()) for name, addresses in result['removed']] +
+            [(name, (), addresses) for name, addresses in result['added']] +
+            result['changed'])
+        if not changes:
+            return
+        yield '--- {0}'.format(fromfile)
+        yield '+++ {0}'.format(tofile)
+        for name, old, new in changes:
+            for address in old:
+                yield '-{0}\t{1}'.format(address, name)
+            for address in new:
+                yield '+{0}\t{1}'.format(address, name)
+
+    def _mappings(self):
+        """
+        Map each name to its addresses, in the order they appear, and each
+         address to its names, in a single pass. A name with a single
+         address, as most are, maps directly to that address rather than to a
+         list. Likewise an address held by a single entry maps to the names
+         of that entry, which must not be changed, and otherwise to a list of
+         the names of each entry, which may repeat. Addresses are mapped in
+         their canonical form in both, converting each distinct ipv6 address
+         once, as the dotted-quad ipv4 addresses accepted already are.
+        :return: A tuple of the dictionaries mapping names and addresses
+        """
+        entries = self._stream_entries() if self.streaming else self.entries
+        mappings = {}
+        address_mappings = {}
+        canonical_addresses = {}
+        # the addresses mapped to a list of names of their own
+        shared = set()
+        for entry in entries:
+            if not entry.is_real_entry():
+                continue
+            address = entry.address
+            if ':' in address:
+                canonical = canonical_addresses.get(address)
+                if canonical is None:
+                    classified = classify_address(address)
+                    canonical = canonical_addresses[address] = (
+                        classified.canonical if classified else address)
+                address = canonical
+            names = address_mappings.get(address)
+            if names is None:
+                address_mappings[address] = entry.names
+            elif address in shared:
+                names.extend(entry.names)
+            else:
+                address_mappings[address] = list(names) + list(entry.names)
+                shared.add(address)
+            for name in entry.names:
+                addresses = mappings.get(name)
+                if addresses is None:
+                    mappings[name] = address
+                elif isinstance(addresses, list):
+                    if address not in addresses:
+                        addresses.append(address)
+                elif addresses != address:
+                    mappings[name] = [addresses, address]
+        return mappings, address_mappings
+
+    def find_by_suffix(self, suffix):
+        """
+        Return all HostsEntry instances from the Hosts object with a name
+         equal to or under the supplied domain, ignoring case. The entries
+         are found through an index of the names by their labels, which is
+         built on first use.
+        :param suffix: A domain, e.g. 'example.com', or a wildcard such as
+         '*.example.com' to only match names under the domain
+        :return: HostsEntry instances, grouped by name in name order
+        """
+        strict = suffix.startswith('*.')
+        if strict:
+            suffix = suffix[2:]
+        if not suffix.strip('.'):
+            raise ValueError('No domain was specified.')
+        if self.streaming:
+            suffix = suffix.lower().rstrip('.')
+            matched = {}
+            for entry in self._stream_entries():
+                if entry.is_real_entry():
+                    for name in entry.names:
+                        if _has_suffix(name, suffix, strict):
+                            matched.setdefault(name, []).append(entry)
+            names = matched
+        else:
+            self._ensure_indexes()
+            if self._suffix_trie is None:
+                self._build_suffix_trie()
+            matched = self._name_index
+            names = _trie_names(self._suffix_trie, _suffix_labels(suffix),
+                                strict)
+        results = []
+        seen = set()
+        for name in sorted(names):
+            for entry in _index_get(matched, name):
+                if entry not in seen:
+                    seen.add(entry)
+                    results.append(entry)
+        return results
+
+    def _build_suffix_trie(self):
+        """
+        Build the index of names by their labels from the name index
+        :return: None
+        """
+        trie = {}
+        for name in self._name_index:
+            _trie_add(trie, name)
+        self._suffix_trie = trie
+
+    def remove_by_suffix(self, suffix):
+        """
+        Remove all HostsEntry instances from the Hosts object with a name
+         equal to or under the supplied domain, as found by find_by_suffix
+        :param suffix: A domain, e.g. 'example.com', or a wildcard such as
+         '*.example.com' to only match names under the domain
+        :return: The count of entries removed
+        """
+        self._check_writable()
+        removed = set(self.find_by_suffix(suffix))
+        self._remove_entries(removed)
+        return {'removed_count': len(removed)}
 
     def find_all_matching(self, address=None, name=None, comment=None):
         """
@@ -306,33 +1866,341 @@ class Hosts(object):
         """
         results = []
         if address or name or comment:
-            for entry in self.entries:
-                if not entry.is_real_entry():
-                    continue
-                if address:
-                    if address != entry.address:
-                        continue
-                if name:
-                    if name not in entry.names:
-                        continue
-                if comment:
-                    if comment != entry.comment:
-                        continue
-                results.append(entry)
+            for entry in self._candidates(address=address, name=name,
+                                          comment=comment):
+                if self._matches(entry, address=address, name=name,
+                                 comment=comment):
+                    results.append(entry)
         return results
 
-    def import_url(self, url=None, force=None):
+    @staticmethod
+    def _matches(entry, address=None, name=None, comment=None):
+        """
+        Test if a HostsEntry is an ipv4 or ipv6 entry matching all of the
+         supplied ip address, name and comment
+        :param entry: An instance of HostsEntry
+        :param address: An ipv4 or ipv6 address
+        :param name: A host name
+        :param comment: A host inline comment
+        :return: True if the entry matches. Otherwise, False.
+        """
+        if not (address or name or comment):
+            return False
+        if not entry.is_real_entry():
+            return False
+        if address:
+            if address != entry.address:
+                return False
+        if name:
+            if name not in entry.names:
+                return False
+        if comment:
+            if comment != entry.comment:
+                return False
+        return True
+
+    def _candidates(self, address=None, name=None, comment=None):
+        """
+        Return the entries that may match the supplied criteria: the smallest
+         index bucket of those supplied, or every entry if streaming
+        :param address: An ipv4 or ipv6 address
+        :param name: A host name
+        :param comment: A host inline comment
+        :return: An iterable of HostsEntry instances
+        """
+        if self.streaming:
+            return self._stream_entries()
+        self._ensure_indexes()
+        candidates = None
+        for index, key in ((self._name_index, name),
+                           (self._address_index, address),
+                           (self._comment_index, comment)):
+            if key:
+                bucket = _index_get(index, key)
+                if candidates is None or len(bucket) < len(candidates):
+                    candidates = bucket
+        return candidates
+
+    def import_url(self, url=None, force=None, cache_dir=None,
+                   only_if_changed=False):
         """
         Read a list of host entries from a URL, convert them into instances
           of HostsEntry and then append to the list of entries in Hosts
         :param url: The URL of where to download a hosts file
+        :param force: Remove matching before adding
+        :param cache_dir: A directory in which to cache the parsed entries
+         with the ETag and Last-Modified headers of the response. Later
+         requests are made conditional on these, and the cached entries are
+         used if the hosts file has not been modified.
+        :param only_if_changed: Skip writing the hosts file, or only append
+         the new entries, as write does, if it is unchanged since it was read
+         and the entries have only been changed through the Hosts methods
         :return: Counts reflecting the attempted additions
         """
-        file_contents = self.get_hosts_by_url(url=url).decode('utf-8')
-        file_contents = file_contents.rstrip().replace('^M', '\n')
-        file_contents = file_contents.rstrip().replace('\r\n', '\n')
-        lines = file_contents.split('\n')
+        import_entries, skipped, _, not_modified = self._get_url_entries(
+            url, cache_dir=cache_dir)
+        add_result = self.add(entries=import_entries, force=force)
+        write_result = self.write(only_if_changed=only_if_changed)
+        result = {'result': 'success',
+                  'skipped': skipped,
+                  'add_result': add_result,
+                  'write_result': write_result}
+        if cache_dir:
+            result['not_modified'] = not_modified
+        return result
+
+    def import_urls(self, urls=None, force=None, workers=None, cache_dir=None,
+                    only_if_changed=False):
+        """
+        Read lists of host entries from several URLs concurrently, convert
+         them into instances of HostsEntry and append them to the list of
+         entries in Hosts. Each response is parsed as it is received and its
+         entries are added, in the order of the URLs, as soon as they are
+         available. The hosts file is written once all have been added.
+        :param urls: A list of URLs of hosts files to download
+        :param force: Remove matching before adding
+        :param workers: The maximum number of concurrent downloads
+        :param cache_dir: A directory in which to cache the parsed entries of
+         each URL, as used by import_url
+        :param only_if_changed: Skip writing the hosts file, or only append
+         the new entries, as write does, if it is unchanged since it was read
+         and the entries have only been changed through the Hosts methods
+        :return: Counts reflecting the attempted additions for each URL
+        """
+        urls = list(urls or [])
+        results = []
+        if urls:
+            pool = ThreadPool(min(len(urls), workers or IMPORT_URL_WORKERS))
+            fetch_url = partial(self._fetch_url, cache_dir=cache_dir)
+            try:
+                for url, parsed in zip(urls, pool.imap(fetch_url, urls)):
+                    if isinstance(parsed, dict):
+                        results.append(parsed)
+                        continue
+                    import_entries, skipped, _, not_modified = parsed
+                    url_result = {
+                        'url': url,
+                        'result': 'success',
+                        'skipped': skipped,
+                        'add_result': self.add(entries=import_entries,
+                                               force=force)}
+                    if cache_dir:
+                        url_result['not_modified'] = not_modified
+                    results.append(url_result)
+            finally:
+                pool.terminate()
+        write_result = self.write(only_if_changed=only_if_changed)
+        failed = any(x['result'] == 'failed' for x in results)
+        return {'result': 'failed' if failed else 'success',
+                'url_results': results,
+                'write_result': write_result}
+
+    def merge(self, sources=None, force=False, allow_address_duplication=False,
+              merge_names=False, cache_dir=None, only_if_changed=False):
+        """
+        Merge the host entries of several files and URLs into Hosts. URLs are
+         downloaded concurrently while files are read. The entries of each
+         source are added in the order of the sources, with the same handling
+         of duplicates as add, and the hosts file is written once at the end.
+        :param sources: A list of paths of files and URLs of hosts files
+        :param force: Remove matching before adding
+        :param allow_address_duplication: Allow using multiple entries
+         for same address
+        :param merge_names: Merge names where address already exists
+        :param cache_dir: A directory in which to cache the parsed entries of
+         each URL, as used by import_url
+        :param only_if_changed: Skip writing the hosts file, or only append
+         the new entries, as write does, if it is unchanged since it was read
+         and the entries have only been changed through the Hosts methods
+        :return: Counts reflecting the attempted additions for each source
+        """
+        sources = list(sources or [])
+        urls = [x for x in sources if '://' in x]
+        results = []
+        pool = ThreadPool(min(len(urls), IMPORT_URL_WORKERS)) if urls else None
+        try:
+            fetched = dict(
+                (url, pool.apply_async(self._fetch_url, (url, cache_dir)))
+                for url in urls)
+            for source in sources:
+                if source in fetched:
+                    parsed = fetched[source].get()
+                elif is_readable(source):
+                    parsed = self._read_import_file(source)
+                else:
+                    parsed = {'result': 'failed',
+                              'message': 'Cannot read: file {0}.'.format(source)}
+                if isinstance(parsed, dict):
+                    results.append({'source': source,
+                                    'result': 'failed',
+                                    'message': parsed['message']})
+                    continue
+                import_entries, skipped, invalid_count = parsed[:3]
+                results.append({
+                    'source': source,
+                    'result': 'success',
+                    'skipped': skipped,
+                    'invalid_count': invalid_count,
+                    'add_result': self.add(
+                        entries=import_entries, force=force,
+                        allow_address_duplication=allow_address_duplication,
+                        merge_names=merge_names)})
+        finally:
+            if pool:
+                pool.terminate()
+        write_result = self.write(only_if_changed=only_if_changed)
+        failed = any(x['result'] == 'failed' for x in results)
+        return {'result': 'failed' if failed else 'success',
+                'source_results': results,
+                'write_result': write_result}
+
+    def _fetch_url(self, url, cache_dir=None):
+        """
+        Download and parse the host entries at a URL, as run by each worker
+         of import_urls
+        :param url: The URL of a hosts file
+        :param cache_dir: A directory in which to cache the parsed entries
+        :return: A tuple as returned by _get_url_entries, or a dictionary
+         describing the failure
+        """
+        try:
+            return self._get_url_entries(url, cache_dir=cache_dir)
+        except (IOError, ValueError) as error:
+            return {'url': url,
+                    'result': 'failed',
+                    'message': 'Cannot read: {0} ({1}).'.format(url, error)}
+
+    def _get_url_entries(self, url, cache_dir=None):
+        """
+        Download and parse the host entries at a URL, with open_url or with
+         get_hosts_by_url if overridden. With a cache directory, the request
+         to open_url is conditional on the cached ETag and Last-Modified
+         values and the cached entries are returned if it is not modified.
+        :param url: The URL of a hosts file
+        :param cache_dir: A directory in which to cache the parsed entries
+        :return: A tuple of the parsed entries, the skipped count, the invalid
+         count and whether the cached entries were used
+        """
+        if type(self).get_hosts_by_url is not Hosts._default_get_hosts_by_url:
+            return self._parse_import_lines(self._iter_response_lines(
+                io.BytesIO(self.get_hosts_by_url(url=url)))) + (False,)
+        if not cache_dir:
+            return self._parse_import_lines(
+                self._iter_response_lines(self.open_url(url))) + (False,)
+        cache_path = os.path.join(cache_dir, '{0}.json'.format(
+            hashlib.sha256(url.encode('utf-8')).hexdigest()))
+        cached = self._read_url_cache(cache_path, url)
+        request = Request(url)
+        if cached:
+            if cached.get('etag'):
+                request.add_header('If-None-Match', cached['etag'])
+            if cached.get('last_modified'):
+                request.add_header('If-Modified-Since', cached['last_modified'])
+        try:
+            response = self.open_url(request)
+        except HTTPError as error:
+            if error.code == 304 and cached:
+                return ([HostsEntry.create(*x) for x in cached['entries']],
+                        cached['skipped'], cached['invalid_count'], True)
+            raise
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        parsed = self._parse_import_lines(self._iter_response_lines(response))
+        if etag or last_modified:
+            self._write_url_cache(cache_path, {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'skipped': parsed[1],
+                'invalid_count': parsed[2],
+                'entries': [[x.entry_type, x.address, x.comment, x.names]
+                            for x in parsed[0]]})
+        return parsed + (False,)
+
+    @staticmethod
+    def _read_url_cache(cache_path, url):
+        """
+        Read the cached response for a URL
+        :param cache_path: The path of the cache file
+        :param url: The URL the cache file should belong to
+        :return: A dictionary of the cached values, or None if there is no
+         usable cache file
+        """
+        try:
+            with open(cache_path, 'r') as cache_file:
+                cached = json.load(cache_file)
+        except (IOError, ValueError):
+            return None
+        if not isinstance(cached, dict) or cached.get('url') != url:
+            return None
+        return cached
+
+    def _write_url_cache(self, cache_path, cached):
+        """
+        Write the cached response for a URL, creating the cache directory if
+         required. Failures are ignored as the cache is only an optimisation.
+        :param cache_path: The path of the cache file
+        :param cached: A dictionary of the values to cache
+        :return: None
+        """
+        try:
+            if not os.path.isdir(os.path.dirname(cache_path)):
+                os.makedirs(os.path.dirname(cache_path))
+            self._write_atomic(cache_path,
+                               json.dumps(cached).encode('utf-8'))
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def _iter_response_lines(response):
+        """
+        Yield the lines of a URL response as they are received, without line
+         endings. Trailing blank lines are dropped.
+        :param response: The response to a request for a hosts file
+        :return: A generator of lines
+        """
+        try:
+            remainder = b''
+            blank_lines = []
+            content_found = False
+            while True:
+                chunk = response.read(URL_CHUNK_SIZE)
+                if chunk:
+                    lines = (remainder + chunk).split(b'\n')
+                    remainder = lines.pop()
+                else:
+                    lines = [remainder]
+                for line in lines:
+                    if line.endswith(b'\r'):
+                        line = line[:-1]
+                    for part in line.decode('utf-8').split('^M'):
+                        if part.strip():
+                            for blank_line in blank_lines:
+                                yield blank_line
+                            blank_lines = []
+                            content_found = True
+                            yield part
+                        else:
+                            blank_lines.append(part)
+                if not chunk:
+                    if not content_found:
+                        yield ''
+                    return
+        finally:
+            response.close()
+
+    @staticmethod
+    def _parse_import_lines(lines):
+        """
+        Convert the lines of a hosts file being imported into instances of
+         HostsEntry. Comments, including inline comments, and blank lines are
+         skipped.
+        :param lines: An iterable of lines
+        :return: A tuple of the entries, the skipped count and the invalid
+         count
+        """
         skipped = 0
+        invalid_count = 0
         import_entries = []
         for line in lines:
             stripped_entry = line.strip()
@@ -344,39 +2212,43 @@ class Hosts(object):
                 import_entry = HostsEntry.str_to_hostentry(line)
                 if import_entry:
                     import_entries.append(import_entry)
-        add_result = self.add(entries=import_entries, force=force)
-        write_result = self.write()
-        return {'result': 'success',
-                'skipped': skipped,
-                'add_result': add_result,
-                'write_result': write_result}
+                else:
+                    invalid_count += 1
+        return import_entries, skipped, invalid_count
+
+    def _read_import_file(self, import_file_path):
+        """
+        Parse a file being imported, in a pool of worker processes if workers
+         is set
+        :param import_file_path: The path to the file containing the host entries
+        :return: A tuple of the entries, the skipped count and the invalid
+         count
+        """
+        if not (self.workers and self.workers > 1):
+            with open(import_file_path, 'r') as infile:
+                return self._parse_import_lines(infile)
+        with open(import_file_path, 'rb') as infile:
+            results = _map_chunks(_parse_import_chunk, infile.read(),
+                                  self.workers)
+        return (_create_entries(row for rows, _, _ in results for row in rows),
+                sum(result[1] for result in results),
+                sum(result[2] for result in results))
 
-    def import_file(self, import_file_path=None):
+    def import_file(self, import_file_path=None, only_if_changed=False):
         """
         Read a list of host entries from a file, convert them into instances
         of HostsEntry and then append to the list of entries in Hosts
         :param import_file_path: The path to the file containing the host entries
+        :param only_if_changed: Skip writing the hosts file, or only append
+         the new entries, as write does, if it is unchanged since it was read
+         and the entries have only been changed through the Hosts methods
         :return: Counts reflecting the attempted additions
         """
-        skipped = 0
-        invalid_count = 0
         if is_readable(import_file_path):
-            import_entries = []
-            with open(import_file_path, 'r') as infile:
-                for line in infile:
-                    stripped_entry = line.strip()
-                    if (not stripped_entry) or (stripped_entry.startswith('#')):
-                        skipped += 1
-                    else:
-                        line = line.partition('#')[0]
-                        line = line.rstrip()
-                        import_entry = HostsEntry.str_to_hostentry(line)
-                        if import_entry:
-                            import_entries.append(import_entry)
-                        else:
-                            invalid_count += 1
+            import_entries, skipped, invalid_count = \
+                self._read_import_file(import_file_path)
             add_result = self.add(entries=import_entries)
-            write_result = self.write()
+            write_result = self.write(only_if_changed=only_if_changed)
             return {'result': 'success',
                     'skipped': skipped,
                     'invalid_count': invalid_count,
@@ -397,19 +2269,145 @@ class Hosts(object):
         :param merge_names: Merge names where address already exists
         :return: The counts of successes and failures
         """
-        ipv4_count = 0
-        ipv6_count = 0
-        comment_count = 0
-        invalid_count = 0
+        self._check_writable()
+        removed = set()
+        import_entries, duplicate_count, replaced_count = self._plan_add(
+            entries, removed, force=force,
+            allow_address_duplication=allow_address_duplication,
+            merge_names=merge_names)
+        self._remove_entries(removed)
+        result = self._append_entries(import_entries)
+        result['duplicate_count'] = duplicate_count
+        result['replaced_count'] = replaced_count
+        return result
+
+    def apply_changes(self, changeset, force=False,
+                      allow_address_duplication=False, merge_names=False,
+                      only_if_changed=False):
+        """
+        Apply a changeset of entries to add and entries to remove, then write
+         the hosts file atomically. The changeset is validated before any
+         change is made. Removals are applied first, as if by remove_many,
+         then the additions, as if by add, with a single pass over the
+         entries for both.
+        :param changeset: A dictionary with an optional 'add' list of
+         instances of HostsEntry or hosts file lines, and an optional
+         'remove' dictionary of 'names', 'addresses' and 'comments' lists
+        :param force: Remove matching before adding
+        :param allow_address_duplication: Allow using multiple entries
+         for same address
+        :param merge_names: Merge names where address already exists
+        :param only_if_changed: Skip writing the hosts file, or only append
+         the new entries, as write does, if it is unchanged since it was read
+         and the entries have only been changed through the Hosts methods
+        :return: The counts of additions, as returned by add, with the count
+         of entries removed
+        """
+        self._check_writable()
+        add_entries, remove = self._validate_changeset(changeset)
+        self._ensure_indexes()
+        removed = set()
+        for index, key in ((self._name_index, 'names'),
+                           (self._address_index, 'addresses'),
+                           (self._comment_index, 'comments')):
+            self._matching_real_entries(index, remove[key], removed)
+        # drop the removed entries from the indexes first so that the
+        # additions are planned against the entries that remain
+        replaced = dict.fromkeys(removed)
+        self._reindex_entries(replaced)
+        add_removed = set()
+        import_entries, duplicate_count, replaced_count = self._plan_add(
+            add_entries, add_removed, force=force,
+            allow_address_duplication=allow_address_duplication,
+            merge_names=merge_names)
+        self._reindex_entries(dict.fromkeys(add_removed))
+        replaced.update(dict.fromkeys(add_removed))
+        if replaced:
+            self._replace_entries(replaced, reindex=False)
+        result = self._append_entries(import_entries)
+        result['duplicate_count'] = duplicate_count
+        result['replaced_count'] = replaced_count
+        result['removed_count'] = len(removed)
+        self.write(atomic=True, only_if_changed=only_if_changed)
+        return result
+
+    @staticmethod
+    def _validate_changeset(changeset):
+        """
+        Check a changeset passed to apply_changes, parsing any lines to add
+        :param changeset: A dictionary of the entries to add and remove
+        :return: A tuple of the list of instances of HostsEntry to add and
+         a dictionary of the set of names, addresses and comments to remove
+        """
+        if not isinstance(changeset, dict):
+            raise ValueError('The changeset must be a dictionary.')
+        unknown = set(changeset) - set(['add', 'remove'])
+        if unknown:
+            raise ValueError('Unknown changeset keys: {0}.'.format(
+                ', '.join(sorted(unknown))))
+        remove = changeset.get('remove') or {}
+        if not isinstance(remove, dict):
+            raise ValueError('The removals must be a dictionary.')
+        unknown = set(remove) - set(['names', 'addresses', 'comments'])
+        if unknown:
+            raise ValueError('Unknown removal keys: {0}.'.format(
+                ', '.join(sorted(unknown))))
+        remove = dict((key, _value_set(remove.get(key), key))
+                      for key in ('names', 'addresses', 'comments'))
+        add = changeset.get('add') or []
+        if isinstance(add, (bytes, type(u''))) or not hasattr(add, '__iter__'):
+            raise ValueError('The additions must be a list of instances of '
+                             'HostsEntry or lines.')
+        add_entries = []
+        for entry in add:
+            if not isinstance(entry, HostsEntry):
+                line = entry
+                try:
+                    entry = HostsEntry.str_to_hostentry(line)
+                except Exception:
+                    entry = None
+                if not entry:
+                    raise ValueError('Invalid entry: {0}.'.format(line))
+            add_entries.append(entry)
+        return add_entries, remove
+
+    def _matching_real_entries(self, index, keys, removed):
+        """
+        Collect the real (ipv4/ipv6) entries held in an index under any of
+         the supplied keys into a set of entries marked for removal
+        :param index: One of the Hosts lookup indexes
+        :param keys: The keys to look up
+        :param removed: A set of HostsEntry instances to update
+        :return: None
+        """
+        for key in keys:
+            removed.update(x for x in _index_get(index, key)
+                           if x.is_real_entry())
+
+    def _plan_add(self, entries, removed, force=False,
+                  allow_address_duplication=False, merge_names=False):
+        """
+        Decide which of the supplied entries to import and which existing
+         entries they replace. Existing entries are only marked for removal
+         so that all replacements can be applied in a single pass.
+        :param entries: A list of instances of HostsEntry
+        :param removed: A set of existing HostsEntry instances to update with
+         those that should be removed
+        :param force: Remove matching before adding
+        :param allow_address_duplication: Allow using multiple entries
+         for same address
+        :param merge_names: Merge names where address already exists
+        :return: A tuple of the entries to import, the duplicate count and
+         the replaced count
+        """
         duplicate_count = 0
         replaced_count = 0
         import_entries = []
-        existing_addresses = [x.address for x in self.entries if x.address]
-        existing_names = []
-        for item in self.entries:
-            if item.names:
-                existing_names.extend(item.names)
-        existing_names = dedupe_list(existing_names)
+        self._ensure_indexes()
+        # the indexes are left untouched until the plan has been applied, so
+        # they reflect the names and addresses that existed before the add
+        existing_addresses = self._address_index
+        existing_names = self._name_index
         for entry in entries:
             if entry.entry_type == 'comment':
                 entry.comment = entry.comment.strip()
@@ -418,10 +2416,10 @@ class Hosts(object):
                 import_entries.append(entry)
             elif entry.address in ('0.0.0.0', '127.0.0.1') or allow_address_duplication:
                 # Allow duplicates entries for addresses used for adblocking
-                if set(entry.names).intersection(existing_names):
+                if any(name in existing_names for name in entry.names):
                     if force:
-                        for name in entry.names:
-                            self.remove_all_matching(name=name)
+                        self._matching_real_entries(existing_names,
+                                                    entry.names, removed)
                         import_entries.append(entry)
                     else:
                         duplicate_count += 1
@@ -431,50 +2429,61 @@ class Hosts(object):
                 if not any((force, merge_names)):
                     duplicate_count += 1
                 elif merge_names:
-                    # get the last entry with matching address
+                    # get the first remaining entry with matching address
                     entry_names = list()
-                    for existing_entry in self.entries:
-                        if entry.address == existing_entry.address:
-                            entry_names = existing_entry.names
+                    for existing_entry in _index_get(existing_addresses,
+                                                     entry.address):
+                        if existing_entry not in removed:
+                            entry_names = list(existing_entry.names)
                             break
                     # merge names with that entry
-                    merged_names = list(set(entry.names + entry_names))
+                    merged_names = list(set(list(entry.names) + entry_names))
                     # remove all matching
-                    self.remove_all_matching(address=entry.address)
+                    self._matching_real_entries(existing_addresses,
+                                                [entry.address], removed)
                     # append merged entry
                     entry.names = merged_names
                     import_entries.append(entry)
                 elif force:
-                    self.remove_all_matching(address=entry.address)
+                    self._matching_real_entries(existing_addresses,
+                                                [entry.address], removed)
                     replaced_count += 1
                     import_entries.append(entry)
-            elif set(entry.names).intersection(existing_names):
+            elif any(name in existing_names for name in entry.names):
                 if not force:
                     duplicate_count += 1
                 else:
-                    for name in entry.names:
-                        self.remove_all_matching(name=name)
+                    self._matching_real_entries(existing_names, entry.names,
+                                                removed)
                     replaced_count += 1
                     import_entries.append(entry)
             else:
                 import_entries.append(entry)
+        return import_entries, duplicate_count, replaced_count
 
+    def _append_entries(self, import_entries):
+        """
+        Append planned entries to Hosts, counting them by type
+        :param import_entries: A list of instances of HostsEntry
+        :return: The counts of entries appended
+        """
+        ipv4_count = 0
+        ipv6_count = 0
+        comment_count = 0
         for item in import_entries:
             if item.entry_type == 'comment':
                 comment_count += 1
-                self.entries.append(item)
+                self._append_entry(item)
             elif item.entry_type == 'ipv4':
                 ipv4_count += 1
-                self.entries.append(item)
+                self._append_entry(item)
             elif item.entry_type == 'ipv6':
                 ipv6_count += 1
-                self.entries.append(item)
+                self._append_entry(item)
         return {'comment_count': comment_count,
                 'ipv4_count': ipv4_count,
                 'ipv6_count': ipv6_count,
-                'invalid_count': invalid_count,
-                'duplicate_count': duplicate_count,
-                'replaced_count': replaced_count}
+                'invalid_count': 0}
 
     def populate_entries(self):
         """
@@ -483,33 +2492,402 @@ class Hosts(object):
          them to the Hosts list of entries.
         :return: None
         """
+        self._ensure_indexes()
+        if self.cache and self._populate_from_snapshot():
+            return
+        if not ((self.workers and self.workers > 1 and
+                 self._populate_in_parallel()) or
+                (self.mmap and self._populate_from_mmap())):
+            content_hash = hashlib.sha256()
+            try:
+                with open(self.path, 'rb') as raw_file:
+                    hosts_file = _text_reader(io.BufferedReader(
+                        _HashingReader(raw_file, content_hash)))
+                    self._extend_entries(
+                        iter_entries(hosts_file, self.compact))
+            except IOError:
+                return {'result': 'failed',
+                        'message': 'Cannot read: {0}.'.format(self.path)}
+            self._content_hash = content_hash
+            self._synced_count = len(self.entries)
+        if self.cache:
+            self._save_snapshot()
+
+    def _snapshot_source(self, source_stat):
+        """
+        Describe the hosts file, and the options it was parsed with, for
+         comparison with the description stored in a snapshot
+        :param source_stat: The result of os.stat for the hosts file
+        :return: A tuple
+        """
+        return (os.path.abspath(self.path), source_stat.st_size,
+                source_stat.st_mtime, locale.getpreferredencoding(False),
+                bool(self.compact), tuple(sys.version_info[:2]))
+
+    def _populate_from_snapshot(self):
+        """
+        Read the entries from the snapshot at the cache path. The snapshot is
+         only used if the path, size, modification time and content hash of
+         the hosts file match those it was saved from. The entries are
+         created with the cyclic garbage collector paused.
+        :return: True if the entries were read from the snapshot
+        """
+        try:
+            with _gc_paused():
+                with open(self.cache, 'rb') as snapshot_file:
+                    data = snapshot_file.read()
+                if not data.startswith(SNAPSHOT_MAGIC):
+                    return False
+                header, rows = marshal.loads(data[len(SNAPSHOT_MAGIC):])
+                del data
+                if header[:-1] != self._snapshot_source(os.stat(self.path)):
+                    return False
+                content_hash = _hash_file(self.path)
+                if content_hash.hexdigest() != header[-1]:
+                    return False
+                create = HostsEntry.create
+                self._extend_entries([create(*row) for row in rows])
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return False
+        self._content_hash = content_hash
+        self._synced_count = len(self.entries)
+        return True
+
+    def _save_snapshot(self):
+        """
+        Save the entries read from the hosts file to a snapshot at the cache
+         path. Each distinct address is stored once. Failures are ignored as
+         the snapshot is only an optimisation.
+        :return: None
+        """
+        if self._synced_count != len(self.entries):
+            return
+        addresses = {}
+        share = addresses.setdefault
         try:
-            with open(self.path, 'r') as hosts_file:
-                hosts_entries = [line for line in hosts_file]
-                for hosts_entry in hosts_entries:
-                    entry_type = HostsEntry.get_entry_type(hosts_entry)
-                    if entry_type == "comment":
-                        hosts_entry = hosts_entry.replace("\r", "")
-                        hosts_entry = hosts_entry.replace("\n", "")
-                        self.entries.append(HostsEntry(entry_type="comment",
-                                                       comment=hosts_entry))
-                    elif entry_type == "blank":
-                        self.entries.append(HostsEntry(entry_type="blank"))
-                    elif entry_type in ("ipv4", "ipv6"):
-                        split_entry = hosts_entry.split('#', 1)
-                        chunked_entry = split_entry[0].split()
-                        comment = None
-                        if len(split_entry) == 2:
-                            comment = split_entry[1].strip()
-                        stripped_name_list = [name.strip() for name in
-                                              chunked_entry[1:]]
-
-                        self.entries.append(
-                            HostsEntry(
-                                entry_type=entry_type,
-                                address=chunked_entry[0].strip(),
-                                names=stripped_name_list,
-                                comment=comment))
-        except IOError:
+            header = self._snapshot_source(os.stat(self.path)) + (
+                self._content_hash.hexdigest(),)
+            with _gc_paused():
+                rows = [(entry.entry_type, share(entry.address, entry.address),
+                         entry.comment, entry.names) for entry in self.entries]
+                data = SNAPSHOT_MAGIC + marshal.dumps((header, rows))
+            self._write_atomic(self.cache, data)
+        except (IOError, OSError, ValueError):
+            pass
+
+    def reload(self, discard_changes=False):
+        """
+        Bring the entries up to date with the hosts file. The file is only
+         read if its modification time, size or inode have changed since the
+         last reload, and the entries are only replaced if its content has
+         changed since it was last read or written. Changes to the entries
+         that have not been written are kept, and the result is a conflict if
+         the file has changed, unless discard_changes is set. If the entries
+         match the file as last read or written, only the lines between the
+         parts of the file that are unchanged, found by comparing hashes of
+         fixed size chunks from its start and end, are parsed again and the
+         lookup indexes are updated in place. Otherwise the file is parsed
+         again. The entries are changed in place, so an instance shared
+         between threads should be reloaded through SharedHosts.
+        :param discard_changes: Replace the entries from the hosts file, even
+         if it is unchanged, when they have changes that have not been written
+        :return: A dictionary with a result of 'unchanged', 'reloaded',
+         'conflict' or 'failed'. After a reload, whether only part of the
+         file was parsed and the counts of entries removed and added.
+        """
+        if self.streaming:
+            return {'result': 'unchanged'}
+        self._ensure_indexes()
+        state = self._reload_state
+        synced = self._synced_count == len(self.entries)
+        try:
+            signature, changed = self._check_reload()
+            if not changed and (synced or not discard_changes):
+                return {'result': 'unchanged'}
+            with open(self.path, 'rb') as hosts_file:
+                data = hosts_file.read()
+        except (IOError, OSError):
             return {'result': 'failed',
                     'message': 'Cannot read: {0}.'.format(self.path)}
+        content_hash = hashlib.sha256(data)
+        if self._content_hash is not None and \
+                content_hash.digest() == self._content_hash.digest() and \
+                (synced or not discard_changes):
+            self._reload_state = (signature,) + _chunk_hashes(
+                data, RELOAD_CHUNK_SIZE) + (
+                len(data), synced and _count_lines(data) == len(self.entries))
+            return {'result': 'unchanged'}
+        if not (synced or discard_changes):
+            return {'result': 'conflict'}
+        result = None
+        if synced and state and state[-1]:
+            result = self._reload_changed_lines(data, state)
+        if result is None:
+            removed_count = len(self.entries)
+            self.entries = []
+            self._reset_indexes()
+            self._extend_entries(iter_entries(_read_chunk(
+                data, locale.getpreferredencoding(False)), self.compact))
+            result = {'result': 'reloaded',
+                      'incremental': False,
+                      'removed_count': removed_count,
+                      'added_count': len(self.entries)}
+        self._content_hash = content_hash
+        self._synced_count = len(self.entries)
+        self._reload_state = (signature,) + _chunk_hashes(
+            data, RELOAD_CHUNK_SIZE) + (
+            len(data), _count_lines(data) == len(self.entries))
+        return result
+
+    def _check_reload(self):
+        """
+        Find if the hosts file may have changed since the last reload, from
+         its modification time, size and inode
+        :return: A tuple of the modification time, size and inode of the
+         hosts file and whether it may have changed
+        """
+        source = os.stat(self.path)
+        signature = (source.st_mtime, source.st_size, source.st_ino)
+        state = self._reload_state
+        return signature, not (state and state[0] == signature)
+
+    def _reload_changed_lines(self, data, state):
+        """
+        Replace the entries parsed from the lines of the hosts file that have
+         changed since it was last read, when each line of the file holds
+         exactly one entry
+        :param data: The new content of the hosts file
+        :param state: The reload state recorded when the file was last read
+        :return: The result of the reload, or None if the file must be
+         parsed again
+        """
+        _, old_prefix, old_suffix, old_size, _ = state
+        new_prefix, new_suffix = _chunk_hashes(data, RELOAD_CHUNK_SIZE)
+        prefix_size = _common_count(old_prefix, new_prefix) * RELOAD_CHUNK_SIZE
+        suffix_chunks = min(_common_count(old_suffix, new_suffix),
+                            (min(old_size, len(data)) - prefix_size) //
+                            RELOAD_CHUNK_SIZE)
+        # the lines ending within the common prefix, and the lines starting
+        # after a line ending within the common suffix, are unchanged
+        prefix_lines = data.count(b'\n', 0, prefix_size)
+        start = data.rfind(b'\n', 0, prefix_size) + 1
+        end = len(data)
+        if suffix_chunks:
+            newline = data.find(b'\n', end - suffix_chunks * RELOAD_CHUNK_SIZE)
+            if newline >= 0:
+                end = newline + 1
+        suffix_lines = _count_lines(data, end)
+        changed = list(iter_entries(_read_chunk(
+            data[start:end], locale.getpreferredencoding(False)),
+            self.compact))
+        if len(changed) != _count_lines(data, start, end):
+            return None
+        stop = len(self.entries) - suffix_lines
+        removed = self.entries[prefix_lines:stop]
+        self._reindex_entries(dict.fromkeys(removed))
+        self.entries = (self.entries[:prefix_lines] + changed +
+                        self.entries[stop:])
+        self._indexed_entries = self.entries
+        self._indexed_count = len(self.entries) - len(changed)
+        for entry in changed:
+            self._index_entry(entry)
+        if suffix_lines:
+            self._sort_buckets(changed)
+        return {'result': 'reloaded',
+                'incremental': True,
+                'removed_count': len(removed),
+                'added_count': len(changed)}
+
+    def _sort_buckets(self, inserted):
+        """
+        Restore the order of the lookup index buckets holding entries that
+         were inserted into the list of entries, rather than appended, so
+         that each bucket again lists its entries in the order they appear
+        :param inserted: A list of the HostsEntry instances inserted
+        :return: None
+        """
+        positions = None
+        addresses = set(x.address for x in inserted if x.address)
+        indexes = [
+            (self._address_index, addresses),
+            (self._name_index, set(name for x in inserted if x.names
+                                   for name in x.names)),
+            (self._comment_index, set(x.comment for x in inserted
+                                      if x.comment))]
+        if self._packed_index is not None:
+            indexes.append((self._packed_index,
+                            set(_packed_address(x) for x in addresses)))
+        for index, keys in indexes:
+            for key in keys:
+                bucket = index.get(key)
+                if isinstance(bucket, list):
+                    if positions is None:
+                        positions = dict(
+                            (x, i) for i, x in enumerate(self.entries))
+                    bucket.sort(key=positions.__getitem__)
+
+    def _populate_in_parallel(self):
+        """
+        Read the entries by parsing chunks of the hosts file in a pool of
+         worker processes
+        :return: True if the file was read. False if it cannot be read
+        """
+        try:
+            with open(self.path, 'rb') as raw_file:
+                data = raw_file.read()
+        except IOError:
+            return False
+        results = _map_chunks(_parse_chunk, data, self.workers, self.compact)
+        self._extend_entries(_create_entries(
+            (row for rows in results for row in rows), self.compact))
+        self._content_hash = hashlib.sha256(data)
+        self._synced_count = len(self.entries)
+        return True
+
+    def _populate_from_mmap(self):
+        """
+        Read the entries by memory mapping the hosts file and parsing the
+         mapped bytes directly
+        :return: True if the file was read. False if it cannot be memory
+         mapped, e.g. as it is empty, missing or not a regular file
+        """
+        if mmap is None:  # pragma: no cover
+            return False
+        try:
+            with open(self.path, 'rb') as raw_file:
+                buffer = mmap.mmap(raw_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return False
+        try:
+            content_hash = hashlib.sha256(buffer)
+            self._extend_entries(_iter_buffer_entries(
+                buffer, locale.getpreferredencoding(False), self.compact))
+        finally:
+            buffer.close()
+        self._content_hash = content_hash
+        self._synced_count = len(self.entries)
+        return True
+
+    def _extend_entries(self, entries):
+        """
+        Append parsed entries to Hosts and to the lookup indexes
+        :param entries: An iterable of HostsEntry instances
+        :return: None
+        """
+        append = self.entries.append
+        index_entry = self._index_entry
+        for entry in entries:
+            append(entry)
+            index_entry(entry)
+
+
+class SharedHosts(object):
+    """
+    A Hosts object shared between threads. Readers query the current
+     snapshot, an instance of Hosts that is never changed, without taking a
+     lock. Writers take a lock, change a copy of the snapshot and then
+     replace the snapshot with it, so readers see each change all at once.
+    """
+    __slots__ = ['_hosts', '_lock']
+
+    READ_ATTRIBUTES = frozenset([
+        'path', 'entries', 'count', 'exists', 'find_all_matching',
+        'find_by_suffix', 'find_in_network', 'names_for', 'resolve', 'diff',
+        'unified_diff'])
+    WRITE_METHODS = frozenset([
+        'add', 'remove_all_matching', 'remove_many', 'remove_names',
+        'remove_by_suffix', 'apply_changes', 'import_file', 'import_url',
+        'import_urls', 'merge', 'write'])
+
+    def __init__(self, hosts=None, **kwargs):
+        """
+        Initialise the shared Hosts object
+        :param hosts: The instance of Hosts to share. If not supplied, one is
+         created with the keyword arguments.
+        :return: None
+        """
+        self._hosts = hosts if hosts is not None else Hosts(**kwargs)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        """
+        Answer queries from the current snapshot and apply changes with
+         update. Other attributes of Hosts are not available.
+        :param name: The name of an attribute of Hosts
+        :return: The attribute
+        """
+        if name in SharedHosts.READ_ATTRIBUTES:
+            return getattr(self._hosts, name)
+        if name in SharedHosts.WRITE_METHODS:
+            return self._writer(name)
+        raise AttributeError(name)
+
+    @property
+    def snapshot(self):
+        """
+        The current snapshot, which must not be changed
+        :return: An instance of Hosts
+        """
+        return self._hosts
+
+    @contextmanager
+    def update(self):
+        """
+        Change the entries as one step. The block is given a copy of the
+         current snapshot to change, which replaces the snapshot when the
+         block completes. Other writers wait for the block to complete. If
+         the block raises an exception the copy is discarded.
+        :return: A context manager yielding an instance of Hosts
+        """
+        with self._lock:
+            hosts = self._hosts.copy()
+            yield hosts
+            self._hosts = hosts
+
+    def reload(self, discard_changes=False):
+        """
+        Reload the entries from the hosts file, as Hosts.reload, only copying
+         the snapshot if the hosts file may have changed
+        :param discard_changes: Replace the entries from the hosts file, even
+         if it is unchanged, when they have changes that have not been written
+        :return: The result of the reload
+        """
+        if not discard_changes:
+            try:
+                if not self._hosts._check_reload()[1]:
+                    return {'result': 'unchanged'}
+            except (IOError, OSError):
+                pass
+        return self._writer('reload')(discard_changes=discard_changes)
+
+    def watch(self, interval=1.0, callback=None):
+        """
+        Start a thread that reloads the entries when the hosts file changes,
+         using inotify where available and otherwise polling. Each reload
+         publishes a new snapshot, so queries from other threads are never
+         answered from partly reloaded entries. Changes that have not been
+         written are kept.
+        :param interval: The number of seconds between checks when polling
+        :param callback: A function called with the result of each reload
+         that changed the entries or found a conflict with changes that have
+         not been written
+        :return: The started instance of HostsWatcher, which is stopped with
+         its stop method
+        """
+        self.reload()
+        watcher = HostsWatcher(self, interval=interval, callback=callback)
+        watcher.start()
+        return watcher
+
+    def _writer(self, name):
+        """
+        Wrap a method of Hosts that changes the entries, or writes the hosts
+         file, to be called within update
+        :param name: The name of the method
+        :return: A function taking the arguments of the method
+        """
+        def call(*args, **kwargs):
+            with self.update() as hosts:
+                return getattr(hosts, name)(*args, **kwargs)
+        return call
@@ -2,10 +2,138 @@
 """
 This module contains utility functions used by the Hosts and HostsEntry methods
 """
+import binascii
 import os
 import re
 
 import socket
+import threading
+from collections import OrderedDict, namedtuple
+
+try:
+    from functools import lru_cache
+except ImportError:  # pragma: no cover
+    lru_cache = None
+
+# A hostname is one or more dot separated labels of 1 to 63 letters, digits
+# and hyphens, where a label may not start or end with a hyphen
+HOSTNAME_REGEX = re.compile(
+    r'(?!-)[A-Z\d-]{1,63}(?<!-)(?:\.(?!-)[A-Z\d-]{1,63}(?<!-))*\Z',
+    re.IGNORECASE)
+
+# The number of distinct results kept by the memoized validators
+CACHE_SIZE = 65536
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def memoize(maxsize=CACHE_SIZE):
+    """
+    Decorator to cache the results of a single argument function, using
+     functools.lru_cache where available
+    :param maxsize: The maximum number of results to keep
+    :return: A decorator
+    """
+    if lru_cache:
+        return lru_cache(maxsize=maxsize)
+    return _lru_memoize(maxsize)
+
+
+def _lru_memoize(maxsize):
+    """
+    Decorator to cache the results of a single argument function, evicting
+     the least recently used result when full, for where functools.lru_cache
+     is unavailable. The wrapper has the cache_info and cache_clear methods
+     of functools.lru_cache.
+    :param maxsize: The maximum number of results to keep
+    :return: A decorator
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        counts = [0, 0]
+        lock = threading.Lock()
+
+        def wrapper(arg):
+            with lock:
+                try:
+                    result = cache.pop(arg)
+                except KeyError:
+                    pass
+                else:
+                    cache[arg] = result
+                    counts[0] += 1
+                    return result
+            result = func(arg)
+            with lock:
+                counts[1] += 1
+                cache[arg] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        def cache_info():
+            with lock:
+                return CacheInfo(counts[0], counts[1], maxsize, len(cache))
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                counts[:] = [0, 0]
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        wrapper.__wrapped__ = func
+        wrapper.__doc__ = func.__doc__
+        wrapper.__name__ = func.__name__
+        return wrapper
+    return decorator
+
+
+Address = namedtuple('Address', ['entry_type', 'packed', 'canonical'])
+
+
+@memoize()
+def classify_address(entry):
+    """
+    Classify and canonicalise the string provided as an ipv4 address in
+     dotted-quad form or an ipv6 address. Results are cached, as a hosts file
+     typically repeats a handful of distinct addresses.
+    :param entry: A string representation of an IP address
+    :return: An Address tuple of the entry type ('ipv4' | 'ipv6'), the packed
+     binary address and the canonical string representation, or None if the
+     string is not a valid address
+    """
+    for entry_type, family in (('ipv4', socket.AF_INET),
+                               ('ipv6', socket.AF_INET6)):
+        try:
+            packed = socket.inet_pton(family, entry)
+        except (socket.error, ValueError):
+            continue
+        return Address(entry_type, packed, socket.inet_ntop(family, packed))
+    return None
+
+
+def network_range(network):
+    """
+    Find the first and last addresses of an ipv4 or ipv6 network in CIDR
+     notation. Host bits set in the network address are ignored.
+    :param network: A network such as '10.0.0.0/8' or 'fd00::/8'. Without a
+     prefix length, the network holds the single address.
+    :return: A tuple of the first and last packed binary addresses
+    """
+    address, separator, prefix = network.partition('/')
+    classified = classify_address(address)
+    if classified is None or (separator and not prefix.isdigit()):
+        raise ValueError('Invalid network: {0}.'.format(network))
+    bits = len(classified.packed) * 8
+    prefix_length = int(prefix) if separator else bits
+    if prefix_length > bits:
+        raise ValueError('Invalid network: {0}.'.format(network))
+    host_mask = (1 << (bits - prefix_length)) - 1
+    first = int(binascii.hexlify(classified.packed), 16) & ~host_mask
+    return tuple(binascii.unhexlify('{0:0{1}x}'.format(value, bits // 4))
+                 for value in (first, first | host_mask))
 
 
 def is_ipv4(entry):
@@ -14,11 +142,8 @@ def is_ipv4(entry):
     :param entry: A string representation of an IP address
     :return: True if valid, False if invalid
     """
-    try:
-        if socket.inet_aton(entry):
-            return True
-    except socket.error:
-        return False
+    address = classify_address(entry)
+    return address is not None and address.entry_type == 'ipv4'
 
 
 def is_ipv6(entry):
@@ -27,11 +152,8 @@ def is_ipv6(entry):
     :param entry: A string representation of an IP address
     :return: True if valid, False if invalid
     """
-    try:
-        if socket.inet_pton(socket.AF_INET6, entry):
-            return True
-    except socket.error:
-        return False
+    address = classify_address(entry)
+    return address is not None and address.entry_type == 'ipv6'
 
 
 def valid_hostnames(hostname_list):
@@ -41,14 +163,21 @@ def valid_hostnames(hostname_list):
     :return: True if the strings are valid hostnames, False if not
     """
     for entry in hostname_list:
-        if len(entry) > 255:
-            return False
-        allowed = re.compile(r'(?!-)[A-Z\d-]{1,63}(?<!-)$', re.IGNORECASE)
-        if not all(allowed.match(x) for x in entry.split(".")):
+        if not is_valid_hostname(entry):
             return False
     return True
 
 
+@memoize()
+def is_valid_hostname(hostname):
+    """
+    Check if the supplied string is a valid hostname
+    :param hostname: A string
+    :return: True if the string is a valid hostname, False if not
+    """
+    return len(hostname) <= 255 and HOSTNAME_REGEX.match(hostname) is not None
+
+
 def is_readable(path=None):
     """
     Test if the supplied filesystem path can be read
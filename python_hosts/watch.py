@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the HostsWatcher class, a thread that reloads an
+instance of SharedHosts when its hosts file changes. On Linux the directory
+holding the hosts file is watched with inotify, so changes are picked up as
+they happen. Elsewhere, or if inotify is unavailable, the file is polled.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+
+def _inotify_watch(path):
+    """
+    Create an inotify instance watching the directory holding a file. The
+     directory is watched, rather than the file, so that the file being
+     replaced, e.g. by an atomic write, is also seen.
+    :param path: The filesystem path of the file
+    :return: The file descriptor of the inotify instance, or None if inotify
+     is unavailable
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        inotify_init = libc.inotify_init
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                  ctypes.c_uint32]
+    fd = inotify_init()
+    if fd < 0:
+        return None
+    directory = os.path.dirname(os.path.abspath(path))
+    if not isinstance(directory, bytes):
+        directory = directory.encode(sys.getfilesystemencoding())
+    if inotify_add_watch(fd, directory, WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class HostsWatcher(threading.Thread):
+    """ A thread that reloads SharedHosts when its hosts file changes. """
+
+    def __init__(self, hosts, interval=1.0, callback=None, use_inotify=True):
+        """
+        Initialise the watcher. It is started with start() and stopped with
+         stop().
+        :param hosts: The instance of SharedHosts to reload. An instance of
+         Hosts may be given if no other thread uses it, as its entries are
+         changed in place by each reload.
+        :param interval: The number of seconds between checks of the hosts
+         file when polling. With inotify, the file is also checked at this
+         interval in case an event is missed.
+        :param callback: A function called with the result of each reload
+         that changed the entries or found a conflict with changes that have
+         not been written
+        :param use_inotify: Watch for changes with inotify where available
+        :return: None
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.hosts = hosts
+        self.interval = interval
+        self.callback = callback
+        self.use_inotify = use_inotify
+        self.inotify = False
+        self._stopping = threading.Event()
+
+    def run(self):
+        """
+        Reload the hosts each time the directory of their hosts file
+         changes, or at each interval, until stopped
+        :return: None
+        """
+        fd = _inotify_watch(self.hosts.path) if self.use_inotify else None
+        self.inotify = fd is not None
+        try:
+            while not self._stopping.is_set():
+                if fd is None:
+                    self._stopping.wait(self.interval)
+                elif select.select([fd], [], [], self.interval)[0]:
+                    # the events are only a prompt to check the hosts file
+                    os.read(fd, 1 << 16)
+                if not self._stopping.is_set():
+                    self.check()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def check(self):
+        """
+        Reload the hosts if their hosts file has changed, keeping changes
+         that have not been written, and call the callback if the entries
+         were changed or there was a conflict
+        :return: The result of the reload
+        """
+        result = self.hosts.reload()
+        if result['result'] in ('reloaded', 'conflict') and self.callback:
+            self.callback(result)
+        return result
+
+    def stop(self, timeout=None):
+        """
+        Stop the watcher and wait for its thread to finish
+        :param timeout: The maximum number of seconds to wait
+        :return: None
+        """
+        self._stopping.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -1,17 +1,69 @@
 # -*- coding: utf-8 -*-
 import datetime
+import hashlib
+import io
+import multiprocessing
 import os
 import getpass
+import socket
 import sys
 import tempfile
+import threading
+import time
 
 import pytest
 
-from python_hosts.hosts import Hosts, HostsEntry
+from python_hosts.hosts import (Hosts, HostsEntry, SharedHosts, iter_entries,
+                                parse_line)
 from python_hosts import exception
+from python_hosts.watch import HostsWatcher
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+@pytest.fixture
+def hosts_server():
+    """
+    Serve hosts files from a local HTTP server. Tests add content to the
+    returned dictionary, keyed by path, and build URLs with its 'url' key.
+    Responses carry an ETag and a matching If-None-Match returns a 304.
+    """
+    content = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = content.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    content['url'] = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    yield content
+    server.shutdown()
+    server.server_close()
+
 
 def test_find_all_matching_by_name_address_comment(tmpdir):
     """
@@ -236,6 +288,29 @@ def test_hosts_write_to_custom_path(tmpdir):
     assert hosts.exists(address='6.6.6.6', names=['example.com'])
 
 
+def test_hosts_reads_native_strings_with_non_ascii_comment(tmpdir):
+    """
+    Test that a hosts file with non-ascii content is read into native
+    strings, and unchanged files are recognised, on python 2 and 3
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write_binary(u"127.0.0.1\tlocalhost # caf\xe9\n".encode('utf-8'))
+    hosts = Hosts(path=hosts_file.strpath)
+    entry = hosts.entries[0]
+    assert isinstance(entry.address, str)
+    assert all(isinstance(name, str) for name in entry.names)
+    assert entry.comment == 'café'
+    assert hosts.write(only_if_changed=True)['total_written'] == 1
+    hosts.add([HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                          names=['example.org'], comment='naïve')])
+    hosts.write()
+    assert hosts_file.read_binary() == (
+        u"127.0.0.1\tlocalhost # caf\xe9\n"
+        u"5.6.7.8\texample.org # na\xefve\n").encode('utf-8')
+    hosts.write(atomic=True)
+    assert Hosts(path=hosts_file.strpath).entries[1].comment == 'naïve'
+
+
 def test_hosts_repr(tmpdir):
     """ Test that the repr method returns a useful representation
      of the hosts object
@@ -777,3 +852,1088 @@ def test_remove_all_matching_failure(tmpdir):
         hosts = Hosts(path=hosts_file.strpath)
         hosts.remove_all_matching()
         hosts.write()
+
+
+def test_find_all_matching_uses_indexes_after_changes(tmpdir):
+    """
+    Test lookups reflect additions and removals made through Hosts
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com example\n"
+                     "0.0.0.0\tads.example.com # blocked\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    assert len(hosts.find_all_matching(name='example')) == 1
+    hosts.add(entries=[HostsEntry(entry_type='ipv4', address='0.0.0.0',
+                                  names=['tracker.example.com'],
+                                  comment='blocked')])
+    assert len(hosts.find_all_matching(address='0.0.0.0')) == 2
+    assert len(hosts.find_all_matching(address='0.0.0.0',
+                                       name='tracker.example.com')) == 1
+    hosts.remove_all_matching(comment='blocked')
+    assert not hosts.find_all_matching(address='0.0.0.0')
+    assert hosts.exists(names=['example.com'])
+
+
+def test_find_all_matching_when_entries_replaced(tmpdir):
+    """
+    Test lookups are correct if the entries list is replaced directly
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    hosts.entries = [HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                                names=['example.org'])]
+    assert not hosts.exists(names=['example.com'])
+    assert hosts.exists(address='5.6.7.8', names=['example.org'])
+
+
+def test_reindex_after_entries_changed_in_place(tmpdir):
+    """
+    Test lookups are correct after an entry is replaced or edited in place
+    and reindex is called
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n5.6.7.8\texample.org\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    assert hosts.exists(names=['example.com'])
+    hosts.entries[0] = HostsEntry(entry_type='ipv4', address='10.9.9.9',
+                                  names=['swapped'])
+    hosts.entries[1].names = ['renamed']
+    hosts.reindex()
+    assert hosts.exists(names=['swapped'])
+    assert not hosts.exists(names=['example.com'])
+    assert len(hosts.find_all_matching(name='renamed')) == 1
+    assert hosts.resolve('swapped') == '10.9.9.9'
+    assert hosts.remove_all_matching(name='swapped') is None
+    hosts.write(only_if_changed=True)
+    assert hosts_file.read() == "5.6.7.8\trenamed\n"
+
+
+def test_add_with_force_replaces_in_bulk(tmpdir):
+    """
+    Test that a forced bulk addition replaces every colliding entry and
+    returns the expected counts
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# header\n"
+                     "1.2.3.4\texample.com\n"
+                     "2.3.4.5\texample.org www.example.org\n"
+                     "0.0.0.0\tads.example.com\n"
+                     "3.4.5.6\tkeep.example.com\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    result = hosts.add(entries=[
+        HostsEntry(entry_type='ipv4', address='9.9.9.9',
+                   names=['example.com', 'www.example.org']),
+        HostsEntry(entry_type='ipv4', address='0.0.0.0',
+                   names=['ads.example.com']),
+        HostsEntry(entry_type='ipv4', address='3.4.5.6',
+                   names=['new.example.com'])], force=True)
+    assert result == {'comment_count': 0, 'ipv4_count': 3, 'ipv6_count': 0,
+                      'invalid_count': 0, 'duplicate_count': 0,
+                      'replaced_count': 2}
+    assert [x.address for x in hosts.entries] == [None, '9.9.9.9', '0.0.0.0',
+                                                  '3.4.5.6']
+    assert not hosts.exists(names=['keep.example.com'])
+    assert not hosts.exists(names=['example.org'])
+
+
+def test_iter_entries_from_path_and_file_object(tmpdir):
+    """
+    Test that entries are yielded lazily from a path or a byte stream
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# header\n\n1.2.3.4\texample.com # a comment\n"
+                     "fe80::1\tlocalhost6\n")
+    entries = iter_entries(hosts_file.strpath)
+    assert next(entries).entry_type == 'comment'
+    assert [x.entry_type for x in entries] == ['blank', 'ipv4', 'ipv6']
+    stream = io.BytesIO(b"1.2.3.4\texample.com # a comment\r\n")
+    entry = next(iter_entries(stream))
+    assert entry.address == '1.2.3.4'
+    assert entry.names == ['example.com']
+    assert entry.comment == 'a comment'
+
+
+def test_iter_entries_skips_invalid_lines_and_rejects_missing_names():
+    """
+    Test that lines without a valid address are skipped, while an address
+    without names raises an exception, as when loading Hosts
+    """
+    stream = io.BytesIO(b"not-an-address\texample.com\n1.2.3.4#x\n"
+                        b"5.6.7.8\texample.org\n")
+    assert [x.address for x in iter_entries(stream)] == ['5.6.7.8']
+    with pytest.raises(Exception):
+        list(iter_entries(io.BytesIO(b"5.6.7.8\texample.org\n1.2.3.4\n")))
+
+
+def test_streaming_hosts_queries_without_loading_entries(tmpdir):
+    """
+    Test that a streaming Hosts instance answers queries from the file
+    without materialising the entries, and refuses changes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# header\n1.2.3.4\texample.com example # a comment\n"
+                     "0.0.0.0\tads.example.com\n")
+    hosts = Hosts(path=hosts_file.strpath, streaming=True)
+    assert hosts.entries == []
+    assert hosts.count() == 3
+    assert hosts.exists(names=['missing.example.com', 'example'])
+    assert hosts.exists(comment='# header')
+    assert not hosts.exists(address='5.6.7.8')
+    assert len(hosts.find_all_matching(comment='a comment')) == 1
+    with pytest.raises(exception.HostsException):
+        hosts.remove_all_matching(name='example')
+    with pytest.raises(exception.HostsException):
+        hosts.write()
+
+
+def test_parse_line_classifies_in_single_pass():
+    """
+    Test that each kind of hosts file line is classified and parsed
+    """
+    assert parse_line('\n').entry_type == 'blank'
+    comment = parse_line('  # a comment\r\n')
+    assert comment.entry_type == 'comment'
+    assert comment.comment == '  # a comment'
+    ipv4 = parse_line('0.0.0.0\tads.example.com ads # blocked\n')
+    assert ipv4.entry_type == 'ipv4'
+    assert ipv4.address == '0.0.0.0'
+    assert ipv4.names == ['ads.example.com', 'ads']
+    assert ipv4.comment == 'blocked'
+    ipv6 = parse_line('fe80::1 localhost6\n')
+    assert ipv6.entry_type == 'ipv6'
+    assert ipv6.comment is None
+    assert parse_line('example.com 1.2.3.4\n') is None
+    assert parse_line('1.2.3.4# not an address\n') is None
+
+
+def test_compact_hosts_share_addresses_and_names(tmpdir):
+    """
+    Test that a compact Hosts instance interns addresses and stores names
+    as tuples, while still supporting changes and writes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("0.0.0.0\tads.example.com\n0.0.0.0\ttracker.example.com\n"
+                     "1.2.3.4\texample.com www.example.com\n")
+    hosts = Hosts(path=hosts_file.strpath, compact=True)
+    assert hosts.entries[0].address is hosts.entries[1].address
+    assert hosts.entries[2].names == ('example.com', 'www.example.com')
+    hosts.add(entries=[HostsEntry(entry_type='ipv4', address='1.2.3.4',
+                                  names=['example.org'])], merge_names=True)
+    assert sorted(hosts.entries[-1].names) == ['example.com', 'example.org',
+                                               'www.example.com']
+    hosts.write()
+    assert Hosts(path=hosts_file.strpath).count() == 3
+
+
+def test_atomic_write_replaces_file_and_keeps_permissions(tmpdir):
+    """
+    Test that an atomic write produces the same content as a plain write,
+    keeps the permissions of the hosts file and leaves no temporary file
+    """
+    etc = tmpdir.mkdir("etc")
+    hosts_file = etc.join("hosts")
+    hosts_file.write("# header\n\n1.2.3.4\texample.com # a comment\n"
+                     "fe80::1\tlocalhost6\n")
+    os.chmod(hosts_file.strpath, 0o640)
+    hosts = Hosts(path=hosts_file.strpath)
+    hosts.add(entries=[HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                                  names=['example.org'])])
+    plain_file = tmpdir.join("plain")
+    plain_result = hosts.write(path=plain_file.strpath)
+    atomic_result = hosts.write(atomic=True)
+    assert atomic_result == plain_result
+    assert atomic_result['total_written'] == 5
+    assert hosts_file.read() == plain_file.read()
+    assert os.stat(hosts_file.strpath).st_mode & 0o777 == 0o640
+    assert os.listdir(etc.strpath) == ['hosts']
+
+
+def test_atomic_write_through_symlink(tmpdir):
+    """
+    Test that an atomic write to a symlinked hosts file replaces the target
+    rather than the link
+    """
+    hosts_file = tmpdir.join("hosts.real")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    link = tmpdir.join("hosts")
+    os.symlink(hosts_file.strpath, link.strpath)
+    hosts = Hosts(path=link.strpath)
+    hosts.remove_all_matching(name='example.com')
+    hosts.write(atomic=True)
+    assert os.path.islink(link.strpath)
+    assert hosts_file.read() == ''
+
+
+def test_write_only_if_changed_skips_unchanged_file(tmpdir):
+    """
+    Test that a write is skipped when nothing has changed since the hosts
+    file was read, and is made when the file has changed on disk
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4 example.com\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    os.utime(hosts_file.strpath, (0, 0))
+    result = hosts.write(only_if_changed=True)
+    assert result['ipv4_entries_written'] == 1
+    assert os.stat(hosts_file.strpath).st_mtime == 0
+    assert hosts_file.read() == "1.2.3.4 example.com\n"
+    hosts_file.write("5.6.7.8 example.org\n")
+    hosts.write(only_if_changed=True)
+    assert hosts_file.read() == "1.2.3.4\texample.com\n"
+
+
+def test_write_only_if_changed_appends_added_entries(tmpdir):
+    """
+    Test that entries added since the hosts file was read are appended,
+    and that a removal causes the whole file to be rewritten
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# keep  this   spacing\n1.2.3.4 example.com")
+    hosts = Hosts(path=hosts_file.strpath)
+    hosts.add(entries=[HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                                  names=['example.org'])])
+    result = hosts.write(only_if_changed=True)
+    assert result['total_written'] == 3
+    assert hosts_file.read() == ("# keep  this   spacing\n1.2.3.4 example.com\n"
+                                 "5.6.7.8\texample.org\n")
+    hosts.add(entries=[HostsEntry(entry_type='ipv4', address='6.7.8.9',
+                                  names=['example.net'])])
+    hosts.write(only_if_changed=True)
+    assert hosts_file.read().endswith("5.6.7.8\texample.org\n"
+                                      "6.7.8.9\texample.net\n")
+    hosts.remove_all_matching(name='example.org')
+    hosts.write(only_if_changed=True)
+    assert hosts_file.read() == ("# keep  this   spacing\n1.2.3.4\texample.com\n"
+                                 "6.7.8.9\texample.net\n")
+
+
+def test_import_file_does_not_rewrite_unchanged_hosts(tmpdir):
+    """
+    Test that importing only duplicate entries leaves the hosts file alone
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("82.132.132.132 example.com example\n")
+    import_file = tmpdir.mkdir("input").join("infile")
+    import_file.write("82.132.132.132\texample.com\texample\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    os.utime(hosts_file.strpath, (0, 0))
+    result = hosts.import_file(import_file.strpath, only_if_changed=True)
+    assert result['add_result']['duplicate_count'] == 1
+    assert result['write_result']['ipv4_entries_written'] == 1
+    assert os.stat(hosts_file.strpath).st_mtime == 0
+
+
+def test_import_file_writes_entries_changed_in_place(tmpdir):
+    """
+    Test that importing writes the whole hosts file by default, so entries
+    changed directly are not lost
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    import_file = tmpdir.mkdir("input").join("infile")
+    import_file.write("5.6.7.8\texample.org\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    hosts.entries[0].names = ['renamed']
+    hosts.import_file(import_file.strpath)
+    assert hosts_file.read() == "1.2.3.4\trenamed\n5.6.7.8\texample.org\n"
+    hosts.entries[0] = HostsEntry(entry_type='ipv4', address='9.9.9.9',
+                                  names=['swapped'])
+    import_file.write("")
+    hosts.import_file(import_file.strpath)
+    assert hosts_file.read() == "9.9.9.9\tswapped\n5.6.7.8\texample.org\n"
+
+
+def test_mmap_parsing_matches_text_parsing(tmpdir):
+    """
+    Test that memory mapped parsing produces the same entries as reading
+    the hosts file as text, and falls back for files that cannot be mapped
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write_binary(b"# header\r\n\r\n1.2.3.4\texample.com www # a\r\n"
+                            b"fe80::1 localhost6\ninvalid line\n"
+                            b"0.0.0.0 ads.example.com")
+    text_hosts = Hosts(path=hosts_file.strpath)
+    mmap_hosts = Hosts(path=hosts_file.strpath, mmap=True)
+    assert repr(mmap_hosts) == repr(text_hosts)
+    assert mmap_hosts.exists(names=['www'])
+    compact_hosts = Hosts(path=hosts_file.strpath, mmap=True, compact=True)
+    assert repr(compact_hosts.entries[2].names) == repr(('example.com', 'www'))
+    hosts_file.write("")
+    assert Hosts(path=hosts_file.strpath, mmap=True).count() == 0
+    assert Hosts(path="invalid", mmap=True).count() == 0
+
+
+def test_import_urls_fetches_sources_concurrently(tmpdir, hosts_server):
+    """
+    Test that several URLs are imported in order with a single write, and
+    that a failing source is reported without stopping the others
+    """
+    hosts_server['/one'] = (b"# first list\r\n1.2.3.4\texample.com\r\n"
+                            b"0.0.0.0\tads.example.com\r\n\r\n")
+    hosts_server['/two'] = (b"5.6.7.8 example.org\n"
+                            b"0.0.0.0 ads.example.com\n" +
+                            b"".join(b"0.0.0.0 ads%d.example.net\n" % i
+                                     for i in range(20000)))
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("6.6.6.6\texample.com\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    urls = [hosts_server['url'] + x for x in ('/one', '/missing', '/two')]
+    result = hosts.import_urls(urls)
+    assert result['result'] == 'failed'
+    one, missing, two = result['url_results']
+    assert one['skipped'] == 1
+    assert one['add_result']['ipv4_count'] == 1
+    assert one['add_result']['duplicate_count'] == 1
+    assert missing['result'] == 'failed'
+    assert two['add_result']['ipv4_count'] == 20001
+    assert two['add_result']['duplicate_count'] == 1
+    assert result['write_result']['ipv4_entries_written'] == 20003
+    assert Hosts(path=hosts_file.strpath).exists(names=['ads19999.example.net'])
+
+
+def test_import_url_from_local_server(tmpdir, hosts_server):
+    """
+    Test that a single URL is streamed, parsed and imported
+    """
+    hosts_server['/hosts'] = b"# list\n1.2.3.4 example.com # inline\n\n\n"
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("")
+    hosts = Hosts(path=hosts_file.strpath)
+    result = hosts.import_url(hosts_server['url'] + '/hosts')
+    assert result['skipped'] == 1
+    assert result['add_result']['ipv4_count'] == 1
+    assert hosts_file.read() == "1.2.3.4\texample.com\n"
+
+
+def test_import_url_uses_cache_when_not_modified(tmpdir, hosts_server):
+    """
+    Test that a cached URL is requested conditionally and its cached entries
+    are imported when the server reports it has not been modified
+    """
+    hosts_server['/hosts'] = b"# list\n1.2.3.4 example.com\n0.0.0.0 ads.com\n"
+    cache_dir = tmpdir.join("cache").strpath
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("")
+    url = hosts_server['url'] + '/hosts'
+    first = Hosts(path=hosts_file.strpath).import_url(url, cache_dir=cache_dir)
+    assert first['not_modified'] is False
+    assert len(os.listdir(cache_dir)) == 1
+    hosts_file.write("")
+    second = Hosts(path=hosts_file.strpath).import_url(url, cache_dir=cache_dir)
+    assert second['not_modified'] is True
+    assert second['skipped'] == 1
+    assert second['add_result']['ipv4_count'] == 2
+    assert hosts_file.read() == "1.2.3.4\texample.com\n0.0.0.0\tads.com\n"
+    hosts_server['/hosts'] = b"5.6.7.8 example.org\n"
+    hosts = Hosts(path=hosts_file.strpath)
+    result = hosts.import_urls([url], cache_dir=cache_dir)
+    assert result['url_results'][0]['not_modified'] is False
+    assert hosts.exists(names=['example.org'])
+
+
+def test_import_url_downloads_with_overridden_methods(tmpdir, hosts_server):
+    """
+    Test that hosts files are downloaded with open_url, and with
+    get_hosts_by_url if a subclass overrides it
+    """
+    hosts_server['/hosts'] = b"1.2.3.4 example.com\n"
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("")
+    opened = []
+
+    class OpeningHosts(Hosts):
+        @staticmethod
+        def open_url(url):
+            opened.append(url)
+            return Hosts.open_url(url)
+
+    hosts = OpeningHosts(path=hosts_file.strpath)
+    hosts.import_url(hosts_server['url'] + '/hosts')
+    hosts.import_url(hosts_server['url'] + '/hosts',
+                     cache_dir=tmpdir.join("cache").strpath)
+    assert len(opened) == 2
+    assert hosts.exists(names=['example.com'])
+
+    class FetchingHosts(Hosts):
+        @staticmethod
+        def get_hosts_by_url(url=None):
+            return b"# list\n5.6.7.8 example.org\n"
+
+    hosts = FetchingHosts(path=hosts_file.strpath)
+    for import_result in (hosts.import_url('http://example.invalid/hosts'),
+                          hosts.import_urls(['http://example.invalid/hosts'])[
+                              'url_results'][0]):
+        assert import_result['skipped'] == 1
+    assert hosts.exists(names=['example.org'])
+
+
+def test_hosts_loads_entries_from_valid_snapshot(tmpdir):
+    """
+    Test that a snapshot is saved on first load, used while the hosts file
+    is unchanged and replaced once it changes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# list\n\n1.2.3.4\texample.com example.net # x\n"
+                     "::1\tlocalhost6\n")
+    cache = tmpdir.join("hosts.snapshot").strpath
+    parsed = Hosts(path=hosts_file.strpath, cache=cache)
+    assert os.path.exists(cache)
+    loaded = Hosts(path=hosts_file.strpath, cache=cache)
+    assert [str(x) for x in loaded.entries] == [str(x) for x in parsed.entries]
+    assert loaded.entries[2].names == ['example.com', 'example.net']
+    assert loaded.exists(names=['example.net'])
+    loaded.add([HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                           names=['example.org'])])
+    loaded.write(only_if_changed=True)
+    assert hosts_file.read().endswith("::1\tlocalhost6\n5.6.7.8\texample.org\n")
+    reloaded = Hosts(path=hosts_file.strpath, cache=cache)
+    assert reloaded.exists(names=['example.org'])
+    assert Hosts(path=hosts_file.strpath, cache=cache).count() == 5
+    compact = Hosts(path=hosts_file.strpath, cache=cache, compact=True)
+    assert compact.entries[2].names == ('example.com', 'example.net')
+
+
+def test_hosts_ignores_invalid_snapshot(tmpdir):
+    """
+    Test that an unreadable or corrupt snapshot falls back to parsing
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    cache = tmpdir.join("hosts.snapshot")
+    cache.write("not a snapshot")
+    assert Hosts(path=hosts_file.strpath, cache=cache.strpath).count() == 1
+    with open(cache.strpath, 'rb') as snapshot_file:
+        data = snapshot_file.read()
+    with open(cache.strpath, 'wb') as snapshot_file:
+        snapshot_file.write(data[:len(data) // 2])
+    assert Hosts(path=hosts_file.strpath, cache=cache.strpath).count() == 1
+
+
+def test_hosts_parses_in_worker_processes(tmpdir):
+    """
+    Test that parsing in worker processes gives the same entries, in the
+    same order, as parsing in a single process
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("".join(
+        "# list {0}\r\n\n1.2.3.{1}\texample{0}.com # x\n::1\tlocalhost\n"
+        "not an entry\n".format(i, i % 250) for i in range(500)))
+    expected = Hosts(path=hosts_file.strpath)
+    hosts = Hosts(path=hosts_file.strpath, workers=2)
+    assert [str(x) for x in hosts.entries] == [str(x) for x in expected.entries]
+    assert hosts.exists(names=['example499.com'])
+    compact = Hosts(path=hosts_file.strpath, workers=2, compact=True)
+    assert compact.entries[2].names == ('example0.com',)
+    import_file = tmpdir.join("import")
+    import_file.write("".join("# x\n10.0.{0}.{1}\timport{2}.com\nbad\n".format(
+        i // 250, i % 250, i) for i in range(500)))
+    result = hosts.import_file(import_file.strpath)
+    assert result['skipped'] == 500
+    assert result['invalid_count'] == 500
+    assert result['add_result']['ipv4_count'] == 500
+    assert Hosts(path=hosts_file.strpath).exists(names=['import499.com'])
+
+
+def test_merge_files_and_urls(tmpdir, hosts_server):
+    """
+    Test that files and URLs are merged in order with the duplicate handling
+    of add, reporting counts per source, with a single write
+    """
+    hosts_server['/list'] = b"# list\n9.9.9.9 example.org\n0.0.0.0 ads.com\n"
+    local = tmpdir.join("local")
+    local.write("# local\n5.6.7.8\texample.com\n0.0.0.0 ads.com\nbad\n")
+    overrides = tmpdir.join("overrides")
+    overrides.write("7.7.7.7\texample.org\n")
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    sources = [local.strpath, hosts_server['url'] + '/list',
+               tmpdir.join("missing").strpath, overrides.strpath]
+    result = hosts.merge(sources, force=True)
+    assert result['result'] == 'failed'
+    local_result, url_result, missing, overrides_result = \
+        result['source_results']
+    assert local_result['source'] == local.strpath
+    assert local_result['skipped'] == 1
+    assert local_result['invalid_count'] == 1
+    assert local_result['add_result']['replaced_count'] == 1
+    assert url_result['add_result']['ipv4_count'] == 2
+    assert missing['result'] == 'failed'
+    assert overrides_result['add_result']['replaced_count'] == 1
+    assert hosts_file.read() == ("5.6.7.8\texample.com\n0.0.0.0\tads.com\n"
+                                 "7.7.7.7\texample.org\n")
+    assert result['write_result']['total_written'] == 3
+
+
+def test_remove_many(tmpdir):
+    """
+    Test that entries matching any of several names, addresses or comments
+    are removed together, with counts for each
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# list\n1.2.3.4\texample.com # keep\n"
+                     "0.0.0.0\tads.com\n0.0.0.0\ttrack.com # drop\n"
+                     "5.6.7.8\texample.org # drop\n::1\tlocalhost\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    result = hosts.remove_many(names={'ads.com', 'example.org', 'missing'},
+                               addresses=['::1'], comments={'drop'})
+    assert result == {'name_count': 2, 'address_count': 1,
+                      'comment_count': 2, 'removed_count': 4}
+    assert [str(x) for x in hosts.entries] == [
+        str(HostsEntry(entry_type='comment', comment='# list')),
+        str(HostsEntry(entry_type='ipv4', address='1.2.3.4',
+                       names=['example.com'], comment='keep'))]
+    assert not hosts.exists(names=['ads.com'])
+    with pytest.raises(ValueError):
+        hosts.remove_many(names=set())
+    for arguments in ({'names': 'example.com'}, {'addresses': u'1.2.3.4'},
+                      {'comments': b'keep'}, {'names': 1}):
+        with pytest.raises(ValueError):
+            hosts.remove_many(**arguments)
+    assert hosts.count() == 2
+
+
+def test_remove_names_keeps_other_names(tmpdir):
+    """
+    Test that names are removed from the entries holding them, that entries
+    left without names are removed and that existing instances are untouched
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com www.example.com # web\n"
+                     "0.0.0.0\tads.com\n5.6.7.8\texample.org ads.com\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    original = hosts.entries[0]
+    with pytest.raises(ValueError):
+        hosts.remove_names('ads.com')
+    result = hosts.remove_names(['www.example.com', 'ads.com', 'missing'])
+    assert result == {'name_count': 3, 'edited_count': 2, 'removed_count': 1}
+    assert original.names == ['example.com', 'www.example.com']
+    assert [str(x) for x in hosts.entries] == [
+        str(HostsEntry(entry_type='ipv4', address='1.2.3.4',
+                       names=['example.com'], comment='web')),
+        str(HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                       names=['example.org']))]
+    assert not hosts.exists(names=['ads.com'])
+    assert not hosts.exists(names=['www.example.com'])
+    assert hosts.find_all_matching(name='example.com') == [hosts.entries[0]]
+    assert hosts.find_all_matching(address='1.2.3.4') == [hosts.entries[0]]
+    assert hosts.find_all_matching(comment='web') == [hosts.entries[0]]
+    hosts.write()
+    assert Hosts(path=hosts_file.strpath).count() == 2
+
+
+def test_find_and_remove_by_suffix(tmpdir):
+    """
+    Test that entries are found and removed by domain, with wildcards only
+    matching subdomains, as the entries change
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# tracker.example\n0.0.0.0\ttracker.example\n"
+                     "0.0.0.0\ta.Tracker.Example b.other.example\n"
+                     "0.0.0.0\tnottracker.example\n"
+                     "1.2.3.4\tc.b.tracker.example.\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    streaming = Hosts(path=hosts_file.strpath, streaming=True)
+    for query in (hosts, streaming):
+        assert [x.names[0] for x in query.find_by_suffix('tracker.example')] \
+            == ['a.Tracker.Example', 'c.b.tracker.example.', 'tracker.example']
+        assert len(query.find_by_suffix('*.TRACKER.example')) == 2
+        assert len(query.find_by_suffix('example')) == 4
+        assert query.find_by_suffix('*.missing.example') == []
+    with pytest.raises(ValueError):
+        hosts.find_by_suffix('*.')
+    hosts.add([HostsEntry(entry_type='ipv4', address='0.0.0.0',
+                          names=['d.tracker.example'])])
+    assert len(hosts.find_by_suffix('*.tracker.example')) == 3
+    hosts.remove_names(['a.Tracker.Example'])
+    assert len(hosts.find_by_suffix('*.tracker.example')) == 2
+    assert hosts.remove_by_suffix('*.tracker.example') == {'removed_count': 2}
+    assert hosts.find_by_suffix('*.tracker.example') == []
+    assert [x.names for x in hosts.find_by_suffix('example')] == [
+        ['b.other.example'], ['nottracker.example'], ['tracker.example']]
+    with pytest.raises(exception.HostsException):
+        streaming.remove_by_suffix('example')
+
+
+def test_resolve_first_match_wins(tmpdir):
+    """
+    Test that names resolve to the first matching address of the requested
+    family, ignoring case, and that changes are reflected
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# list\nfe80::1\tExample.com\n1.2.3.4\texample.com www\n"
+                     "5.6.7.8\texample.com\n::1\tlocalhost\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    streaming = Hosts(path=hosts_file.strpath, streaming=True)
+    for query in (hosts, streaming):
+        assert query.resolve('example.com') == 'fe80::1'
+        assert query.resolve('EXAMPLE.COM.', family='ipv4') == '1.2.3.4'
+        assert query.resolve('example.com', family=socket.AF_INET6) == 'fe80::1'
+        assert query.resolve('www', family='ipv6') is None
+        assert query.resolve('missing') is None
+    with pytest.raises(ValueError):
+        hosts.resolve('example.com', family='ipv5')
+    hosts.remove_all_matching(address='1.2.3.4')
+    assert hosts.resolve('example.com', family='ipv4') == '5.6.7.8'
+    assert hosts.resolve('www') is None
+    hosts.add([HostsEntry(entry_type='ipv4', address='9.9.9.9',
+                          names=['www'])])
+    assert hosts.resolve('www') == '9.9.9.9'
+    hosts.entries.append(HostsEntry(entry_type='ipv4', address='8.8.8.8',
+                                    names=['dns']))
+    assert hosts.resolve('dns') == '8.8.8.8'
+
+
+def test_names_for_and_find_in_network(tmpdir):
+    """
+    Test that addresses are matched by value and networks by range, as the
+    entries change
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("10.0.0.2\tb.example\n::1\tlocalhost ip6-localhost\n"
+                     "10.0.0.1\ta.example\n10.1.0.1\tc.example\n"
+                     "0:0:0:0:0:0:0:1\tlocalhost loopback\n11.0.0.1\td.example\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    streaming = Hosts(path=hosts_file.strpath, streaming=True)
+    for query in (hosts, streaming):
+        assert query.names_for('::0001') == ['localhost', 'ip6-localhost',
+                                              'loopback']
+        assert query.names_for('10.0.0.1') == ['a.example']
+        assert query.names_for('10.9.9.9') == []
+        assert query.names_for('example.com') == []
+        assert [x.names[0] for x in query.find_in_network('10.0.0.0/8')] == [
+            'a.example', 'b.example', 'c.example']
+        assert [x.names[0] for x in query.find_in_network('10.0.0.0/24')] == [
+            'a.example', 'b.example']
+        assert len(query.find_in_network('::/0')) == 2
+    with pytest.raises(ValueError):
+        hosts.find_in_network('10.0.0.0/33')
+    hosts.add([HostsEntry(entry_type='ipv4', address='10.0.0.3',
+                          names=['e.example'])])
+    assert len(hosts.find_in_network('10.0.0.0/24')) == 3
+    hosts.remove_all_matching(address='10.0.0.1')
+    hosts.remove_names(['localhost', 'loopback'])
+    assert hosts.names_for('::1') == ['ip6-localhost']
+    assert [x.names[0] for x in hosts.find_in_network('10.0.0.0/8')] == [
+        'b.example', 'e.example', 'c.example']
+    assert hosts._packed_keys[4] == sorted(hosts._packed_keys[4])
+    assert len(hosts._packed_keys[4]) == 4
+
+
+def test_diff_and_unified_diff(tmpdir):
+    """
+    Test that added, removed and changed names are found, including against
+    a streaming instance, and rendered as a unified style diff
+    """
+    old_file = tmpdir.join("old")
+    old_file.write("# old\n1.2.3.4\texample.com www.example.com\n"
+                   "0.0.0.0\tads.com\n10.0.0.1\tdb\n10.0.0.2\tdb\n")
+    new_file = tmpdir.join("new")
+    new_file.write("# new\n1.2.3.4\twww.example.com\n5.6.7.8\texample.com\n"
+                   "10.0.0.1\tdb\n10.0.0.2\tdb\n0.0.0.0\ttrack.com\n")
+    old = Hosts(path=old_file.strpath)
+    for new in (Hosts(path=new_file.strpath),
+                Hosts(path=new_file.strpath, streaming=True)):
+        assert old.diff(new) == {
+            'added': [('track.com', ('0.0.0.0',))],
+            'removed': [('ads.com', ('0.0.0.0',))],
+            'changed': [('example.com', ('1.2.3.4',), ('5.6.7.8',))],
+            'addresses': {
+                'added': [('5.6.7.8', ('example.com',))],
+                'removed': [],
+                'changed': [('0.0.0.0', ('ads.com',), ('track.com',)),
+                            ('1.2.3.4', ('example.com',), ())]}}
+    assert list(old.unified_diff(new, 'old', 'new')) == [
+        '--- old', '+++ new', '-0.0.0.0\tads.com', '-1.2.3.4\texample.com',
+        '+5.6.7.8\texample.com', '+0.0.0.0\ttrack.com']
+    assert list(old.unified_diff(old)) == []
+
+
+def test_diff_compares_addresses_in_canonical_form(tmpdir):
+    """
+    Test that the address view of diff matches addresses however they are
+    written and compares the names of each address regardless of order
+    """
+    old_file = tmpdir.join("old")
+    old_file.write("::1\tlocalhost ip6-localhost\n0.0.0.0\ta.com\n"
+                   "0.0.0.0\tb.com\n10.0.0.1\tdb\n")
+    new_file = tmpdir.join("new")
+    new_file.write("0:0::1\tip6-localhost localhost\n0.0.0.0\tb.com c.com\n"
+                   "fe80::0001\tlink\n")
+    old = Hosts(path=old_file.strpath)
+    new = Hosts(path=new_file.strpath)
+    result = old.diff(new)
+    assert not [x for x in old.unified_diff(new) if 'localhost' in x]
+    assert result['addresses'] == {
+        'added': [('fe80::1', ('link',))],
+        'removed': [('10.0.0.1', ('db',))],
+        'changed': [('0.0.0.0', ('a.com',), ('c.com',))]}
+    assert result['changed'] == []
+    assert result['added'] == [('c.com', ('0.0.0.0',)), ('link', ('fe80::1',))]
+    assert result['removed'] == [('a.com', ('0.0.0.0',)), ('db', ('10.0.0.1',))]
+
+
+def test_apply_changes(tmpdir):
+    """
+    Test that a changeset is validated, then its removals and additions are
+    applied together and written
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("# list\n1.2.3.4\texample.com\n0.0.0.0\tads.com\n"
+                     "0.0.0.0\ttrack.com # old\n5.6.7.8\texample.org\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    for changeset in ({'add': ['1.2.3.4']}, {'add': ['not an entry']},
+                      {'update': []}, {'remove': {'hosts': ['ads.com']}},
+                      {'remove': ['ads.com']}, []):
+        with pytest.raises(ValueError):
+            hosts.apply_changes(changeset)
+    assert hosts.count() == 5
+    for changeset in ({'add': '10.0.0.9 x.com'}, {'add': 1},
+                      {'remove': {'names': 'a'}},
+                      {'remove': {'addresses': u'1.2.3.4'}},
+                      {'remove': {'comments': b'old'}},
+                      {'add': ['10.0.0.9 x.com'], 'remove': {'names': 7}}):
+        with pytest.raises(ValueError) as error:
+            hosts.apply_changes(changeset)
+        assert 'Invalid entry' not in str(error.value)
+    assert hosts.count() == 5
+    result = hosts.apply_changes({
+        'add': ['0.0.0.0 ads.com', '9.9.9.9 example.com # new',
+                HostsEntry(entry_type='ipv4', address='10.0.0.1',
+                           names=['db'])],
+        'remove': {'names': ['ads.com'], 'comments': ['old']}},
+        force=True)
+    assert result == {'comment_count': 0, 'ipv4_count': 3, 'ipv6_count': 0,
+                      'invalid_count': 0, 'duplicate_count': 0,
+                      'replaced_count': 1, 'removed_count': 2}
+    assert hosts_file.read() == ("# list\n5.6.7.8\texample.org\n"
+                                 "0.0.0.0\tads.com\n"
+                                 "9.9.9.9\texample.com # new\n10.0.0.1\tdb\n")
+    result = hosts.apply_changes({'add': ['5.6.7.8 example.org']})
+    assert result['duplicate_count'] == 1
+    assert Hosts(path=hosts_file.strpath).count() == 5
+
+
+def test_reload_parses_changed_lines(tmpdir, monkeypatch):
+    """
+    Test that reload skips unchanged files, parses only the changed lines
+    of a file matching its entries and parses the whole of any other file
+    """
+    monkeypatch.setattr('python_hosts.hosts.RELOAD_CHUNK_SIZE', 32)
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    lines = ["0.0.0.0\tads{0}.example.com".format(i) for i in range(100)]
+    hosts_file.write("\n".join(lines) + "\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    assert hosts.reload() == {'result': 'unchanged'}
+    assert hosts.reload() == {'result': 'unchanged'}
+    hosts.remove_all_matching(name='ads0.example.com')
+    assert hosts.reload() == {'result': 'unchanged'}
+    assert not hosts.exists(names=['ads0.example.com'])
+    result = hosts.reload(discard_changes=True)
+    assert result['result'] == 'reloaded'
+    assert hosts.exists(names=['ads0.example.com'])
+    lines[50] = "1.2.3.4\tchanged.example.com # edited"
+    hosts_file.write("\n".join(lines) + "\n")
+    result = hosts.reload()
+    assert result['incremental'] is True
+    assert result['removed_count'] == result['added_count'] < 20
+    assert hosts.resolve('changed.example.com') == '1.2.3.4'
+    assert hosts.find_all_matching(comment='edited')[0].names == [
+        'changed.example.com']
+    assert not hosts.exists(names=['ads50.example.com'])
+    assert [x.names[0] for x in hosts.find_all_matching(address='0.0.0.0')][
+        48:51] == ['ads48.example.com', 'ads49.example.com',
+                   'ads51.example.com']
+    hosts_file.write("\n".join(lines) + "\n0.0.0.0\tnew.example.com\n")
+    result = hosts.reload()
+    assert result['incremental'] is True
+    assert result['added_count'] - result['removed_count'] == 1
+    hosts_file.write("not an entry\n" + "\n".join(lines[1:]) + "\n")
+    result = hosts.reload()
+    assert result['incremental'] is False
+    assert hosts.count() == 99
+    assert [str(x) for x in hosts.entries] == [
+        str(x) for x in Hosts(path=hosts_file.strpath).entries]
+
+
+def test_hosts_watcher_reloads_on_change(tmpdir):
+    """
+    Test that the watcher reloads the entries when the hosts file changes,
+    with inotify where available and by polling
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    for use_inotify in (True, False):
+        hosts_file.write("1.2.3.4\texample.com\n")
+        hosts = SharedHosts(path=hosts_file.strpath)
+        reloaded = threading.Event()
+        watcher = HostsWatcher(hosts, interval=0.05, use_inotify=use_inotify,
+                               callback=lambda result: reloaded.set())
+        watcher.start()
+        try:
+            hosts_file.write("1.2.3.4\texample.com\n5.6.7.8\texample.org\n")
+            assert reloaded.wait(5)
+            assert hosts.exists(names=['example.org'])
+        finally:
+            watcher.stop()
+        assert not watcher.is_alive()
+
+
+def test_watch_keeps_unsaved_changes(tmpdir):
+    """
+    Test that the watcher does not reload over changes that have not been
+    written, reporting a conflict if the hosts file changes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    shared = SharedHosts(path=hosts_file.strpath)
+    results = []
+    conflict = threading.Event()
+
+    def record(result):
+        results.append(result)
+        if result['result'] == 'conflict':
+            conflict.set()
+
+    watcher = shared.watch(interval=0.05, callback=record)
+    try:
+        shared.add([HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                               names=['example.org'])])
+        time.sleep(0.3)
+        assert shared.exists(names=['example.org'])
+        hosts_file.write("1.2.3.4\texample.com\n9.9.9.9\texample.net\n")
+        assert conflict.wait(5)
+        assert shared.exists(names=['example.org'])
+        assert not shared.exists(names=['example.net'])
+    finally:
+        watcher.stop()
+    assert all(result['result'] == 'conflict' for result in results)
+    shared.write()
+    assert Hosts(path=hosts_file.strpath).exists(names=['example.org'])
+    assert shared.reload() == {'result': 'unchanged'}
+    assert shared.exists(names=['example.org'])
+
+
+def test_shared_hosts_reload_while_queried(tmpdir):
+    """
+    Test that threads querying an instance of SharedHosts while it is
+    reloaded always see complete entries
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    lines = ["0.0.0.0\tads{0}.example.com".format(i) for i in range(500)]
+    hosts_file.write("\n".join(lines) + "\n")
+    shared = SharedHosts(path=hosts_file.strpath)
+    errors = []
+    done = threading.Event()
+
+    def query():
+        try:
+            while not done.is_set():
+                assert len(shared.find_by_suffix('example.com')) == 500
+                assert len(shared.find_all_matching(address='0.0.0.0')) == 500
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+
+    readers = [threading.Thread(target=query) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(20):
+            lines[i] = "0.0.0.0\tads{0}.example.com # {1}".format(i, i)
+            hosts_file.write("\n".join(lines) + "\n")
+            os.utime(hosts_file.strpath, (i, i))
+            assert shared.reload()['result'] == 'reloaded'
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+
+
+def test_copy_is_independent(tmpdir):
+    """
+    Test that changes to a copy of an instance of Hosts do not change the
+    entries or lookups of the original
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com www.example.com\n"
+                     "5.6.7.8\texample.org\n")
+    hosts = Hosts(path=hosts_file.strpath)
+    assert hosts.resolve('example.org') == '5.6.7.8'
+    copy = hosts.copy()
+    copy.remove_all_matching(name='example.org')
+    copy.add([HostsEntry(entry_type='ipv4', address='9.9.9.9',
+                         names=['example.net'])])
+    assert copy.exists(names=['example.net'])
+    assert not copy.exists(names=['example.org'])
+    assert copy.find_by_suffix('example.com') != []
+    assert hosts.count() == 2
+    assert hosts.exists(names=['example.org'])
+    assert not hosts.exists(names=['example.net'])
+    assert hosts.resolve('example.org') == '5.6.7.8'
+    assert hosts.resolve('example.net') is None
+    assert hosts.names_for('5.6.7.8') == ['example.org']
+
+
+class _LabelledHosts(Hosts):
+    """ A subclass of Hosts with an instance attribute """
+
+    def __init__(self, path=None, label=None):
+        super(_LabelledHosts, self).__init__(path=path)
+        self.label = label
+
+
+def test_copy_keeps_subclass(tmpdir):
+    """
+    Test that copies of a subclass of Hosts, including those published by
+    SharedHosts, keep its class and attributes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    shared = SharedHosts(_LabelledHosts(path=hosts_file.strpath,
+                                        label='lab'))
+    shared.add([HostsEntry(entry_type='ipv4', address='5.6.7.8',
+                           names=['example.org'])])
+    assert type(shared.snapshot) is _LabelledHosts
+    assert shared.snapshot.label == 'lab'
+    assert shared.exists(names=['example.org'])
+    assert shared.snapshot.copy().label == 'lab'
+
+
+def test_shared_hosts_readers_and_writer(tmpdir):
+    """
+    Test that threads reading an instance of SharedHosts always see a
+    consistent snapshot while another thread adds and removes entries
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("".join("10.0.{0}.{1}\thost{0}-{1}.example.com\n".format(
+        i // 250, i % 250) for i in range(1000)))
+    shared = SharedHosts(path=hosts_file.strpath)
+    errors = []
+    stopping = threading.Event()
+
+    def read():
+        try:
+            while not stopping.is_set():
+                snapshot = shared.snapshot
+                assert snapshot.count() in (1000, 1001)
+                assert shared.exists(names=['host0-1.example.com'])
+                assert shared.resolve('host3-249.example.com') == '10.0.3.249'
+                assert len(shared.find_all_matching(
+                    address='10.0.1.1')) == 1
+        except Exception as exc:
+            errors.append(exc)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(20):
+            shared.add([HostsEntry(entry_type='ipv4', address='9.9.9.9',
+                                   names=['added.example.com'])])
+            assert shared.exists(names=['added.example.com'])
+            shared.remove_all_matching(name='added.example.com')
+            assert not shared.exists(names=['added.example.com'])
+    finally:
+        stopping.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+    assert shared.count() == 1000
+
+
+def test_shared_hosts_update_discards_on_error(tmpdir):
+    """
+    Test that changes made in an update are only published when the block
+    completes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("1.2.3.4\texample.com\n")
+    shared = SharedHosts(path=hosts_file.strpath)
+    original = shared.snapshot
+    with pytest.raises(ValueError):
+        with shared.update() as hosts:
+            hosts.remove_all_matching(name='example.com')
+            raise ValueError('discard')
+    assert shared.snapshot is original
+    assert shared.exists(names=['example.com'])
+    with shared.update() as hosts:
+        hosts.remove_all_matching(name='example.com')
+    assert shared.snapshot is not original
+    assert shared.count() == 0
+    assert original.count() == 1
+    with pytest.raises(AttributeError):
+        shared.missing
+    assert shared.reload() == {'result': 'unchanged'}
+    assert shared.count() == 0
+    assert shared.reload(discard_changes=True)['result'] == 'reloaded'
+    assert shared.exists(names=['example.com'])
+    reloaded = shared.snapshot
+    assert shared.reload()['result'] == 'unchanged'
+    assert shared.snapshot is reloaded
+
+
+def _add_locked(args):
+    """ Add an entry to a hosts file while holding its lock """
+    path, number = args
+    with Hosts.locked(path) as hosts:
+        hosts.add([HostsEntry(entry_type='ipv4',
+                              address='10.0.0.{0}'.format(number),
+                              names=['host{0}.example.com'.format(number)])])
+        hosts.write(atomic=True)
+    return hosts.lock_wait
+
+
+def test_locked_serialises_changes(tmpdir):
+    """
+    Test that processes changing a hosts file with Hosts.locked do not
+    overwrite each other's changes
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("127.0.0.1\tlocalhost\n")
+    pool = multiprocessing.Pool(4)
+    try:
+        waits = pool.map(_add_locked,
+                         [(hosts_file.strpath, i) for i in range(1, 21)])
+    finally:
+        pool.close()
+        pool.join()
+    assert all(wait >= 0 for wait in waits)
+    hosts = Hosts(path=hosts_file.strpath)
+    assert hosts.count() == 21
+    for number in range(1, 21):
+        assert hosts.exists(names=['host{0}.example.com'.format(number)])
+
+
+def test_locked_times_out(tmpdir):
+    """
+    Test that waiting for a lock held elsewhere raises UnableToLockHosts
+    after the timeout, and the time spent waiting is recorded
+    """
+    hosts_file = tmpdir.mkdir("etc").join("hosts")
+    hosts_file.write("127.0.0.1\tlocalhost\n")
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with Hosts.locked(hosts_file.strpath):
+            acquired.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        assert acquired.wait(5)
+        with pytest.raises(exception.UnableToLockHosts):
+            with Hosts.locked(hosts_file.strpath, timeout=0.05):
+                pass
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        with Hosts.locked(hosts_file.strpath, timeout=5) as hosts:
+            assert hosts.lock_wait > 0
+            assert hosts.exists(names=['localhost'])
+    finally:
+        release.set()
+        holder.join()
+    with Hosts.locked(hosts_file.strpath, timeout=0) as hosts:
+        assert hosts.count() == 1
@@ -2,7 +2,11 @@
 import os
 import sys
 
-from python_hosts.utils import is_ipv4, is_ipv6, valid_hostnames
+import pytest
+
+from python_hosts.utils import (_lru_memoize, classify_address, is_ipv4,
+                                is_ipv6, is_valid_hostname, network_range,
+                                valid_hostnames)
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
@@ -16,6 +20,8 @@ def test_ipv4_validation_failure():
     Test function returns False if invalid IPv4 address is specified
     """
     assert not is_ipv4('256.8.8.8')
+    assert not is_ipv4('1')
+    assert not is_ipv4('0x7f.1')
 
 
 def test_ipv6_validation_success():
@@ -52,3 +58,76 @@ def test_hostname_validation_failure_with_leading_hyphen():
     Test function returns False if a hostname with a leading hyphen is specified
     """
     assert not valid_hostnames(['example.com', '-example'])
+
+
+def test_hostname_validation_failure_with_invalid_label():
+    """
+    Test function returns False if any label of a hostname is invalid
+    """
+    assert not valid_hostnames(['example-.com'])
+    assert not valid_hostnames(['example..com'])
+    assert not valid_hostnames(['example.com.'])
+    assert not valid_hostnames(['{0}.com'.format('x' * 64)])
+    assert valid_hostnames(['{0}.com'.format('x' * 63)])
+
+
+def test_hostname_validation_is_cached():
+    """
+    Test repeated hostnames are answered from the cache
+    """
+    is_valid_hostname.cache_clear()
+    assert valid_hostnames(['cached.example.com', 'cached.example.com'])
+    assert is_valid_hostname.cache_info().hits == 1
+
+
+def test_lru_memoize_evicts_least_recently_used():
+    """
+    Test the fallback for functools.lru_cache keeps the most recently used
+    results and counts hits and misses
+    """
+    calls = []
+
+    @_lru_memoize(2)
+    def double(value):
+        calls.append(value)
+        return value * 2
+
+    assert [double(1), double(2), double(1), double(3)] == [2, 4, 2, 6]
+    assert double(1) == 2
+    assert double(2) == 4
+    assert calls == [1, 2, 3, 2]
+    info = double.cache_info()
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (2, 4, 2, 2)
+    double.cache_clear()
+    assert double.cache_info().currsize == 0
+
+
+def test_classify_address_canonicalises():
+    """
+    Test addresses are classified with their packed and canonical forms
+    """
+    ipv4 = classify_address('127.0.0.1')
+    assert ipv4.entry_type == 'ipv4'
+    assert ipv4.packed == b'\x7f\x00\x00\x01'
+    assert ipv4.canonical == '127.0.0.1'
+    ipv6 = classify_address('0:0:0:0:0:0:0:1')
+    assert ipv6.entry_type == 'ipv6'
+    assert ipv6.packed == b'\x00' * 15 + b'\x01'
+    assert ipv6.canonical == '::1'
+    assert classify_address('example.com') is None
+
+
+def test_network_range():
+    """
+    Test the first and last addresses of networks are found
+    """
+    assert network_range('10.1.2.3/8') == (b'\x0a\x00\x00\x00',
+                                           b'\x0a\xff\xff\xff')
+    assert network_range('1.2.3.4') == (b'\x01\x02\x03\x04',) * 2
+    assert network_range('0.0.0.0/0') == (b'\x00' * 4, b'\xff' * 4)
+    assert network_range('fd00::/8') == (b'\xfd' + b'\x00' * 15,
+                                         b'\xfd' + b'\xff' * 15)
+    for network in ('10.0.0.0/33', '10.0.0.0/', '10.0.0.0/-1', 'fd00::/129',
+                    'example.com/8', '10/8'):
+        with pytest.raises(ValueError):
+            network_range(network)